@@ -0,0 +1,145 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from scipy.spatial import cKDTree
+
+from .road_graph import KM_PER_DEGREE, load_road_graph
+from .response_time_map import hospital_nodes
+
+DEFAULT_THRESHOLDS = (5, 10, 15, 20)
+
+def _cell_times(xy, times, origin, max_minutes, max_access_km, resolution_km, neighbors=8):
+    """Response time and origin of every raster cell around the reachable road nodes.
+
+    A cell is reached from one of its neighbors nearest road nodes within
+    max_access_km, leaving the road at 2 min/km as in response_time_grid,
+    after 1 min dispatch. All cells are resolved in one batched KD-tree query.
+
+    Returns:
+        tuple: (cell_time, cell_origin) rasters, (x0, y0) of the lower-left
+        cell corner in km, or None when no node is reachable
+    """
+    reachable = np.flatnonzero(np.isfinite(times) & (times < max_minutes - 1))
+    if len(reachable) == 0:
+        return None
+    xy, times, origin = xy[reachable], times[reachable], origin[reachable]
+
+    x0, y0 = xy.min(axis=0) - max_access_km
+    x1, y1 = xy.max(axis=0) + max_access_km
+    cols = int(np.ceil((x1 - x0) / resolution_km))
+    rows = int(np.ceil((y1 - y0) / resolution_km))
+    cx, cy = np.meshgrid(x0 + (np.arange(cols) + 0.5) * resolution_km, y0 + (np.arange(rows) + 0.5) * resolution_km)
+
+    k = min(neighbors, len(xy))
+    distance, nearest = cKDTree(xy).query(np.column_stack([cx.ravel(), cy.ravel()]), k=k,
+                                          distance_upper_bound=max_access_km)
+    distance, nearest = distance.reshape(-1, k), nearest.reshape(-1, k)
+    found = nearest < len(xy)
+    cost = np.where(found, times[np.minimum(nearest, len(xy) - 1)] + 2 * distance, np.inf)
+    best = cost.argmin(axis=1)
+
+    cell_time = 1 + cost[np.arange(len(cost)), best]
+    cell_origin = np.where(np.isfinite(cell_time), origin[np.minimum(nearest[np.arange(len(cost)), best], len(xy) - 1)], -1)
+    return cell_time.reshape(rows, cols), cell_origin.reshape(rows, cols), (x0, y0)
+
+def _raster_polygon(mask, x0, y0, resolution_km):
+    """Polygon covering the True cells of a raster, built from one box per horizontal run of cells"""
+    padded = np.pad(mask, ((0, 0), (1, 1))).astype(np.int8)
+    change = np.diff(padded, axis=1)
+    start_rows, start_cols = np.nonzero(change == 1)
+    _, end_cols = np.nonzero(change == -1)
+    boxes = shapely.box(x0 + start_cols * resolution_km, y0 + start_rows * resolution_km,
+                        x0 + end_cols * resolution_km, y0 + (start_rows + 1) * resolution_km)
+    return shapely.union_all(boxes).simplify(resolution_km / 2)
+
+def hospital_isochrones(graph, hospitals_gdf, thresholds=DEFAULT_THRESHOLDS, per_hospital=False, profile="distance",
+                        node_time=None, node_hospital=None, max_access_km=0.5, resolution_km=0.05):
+    """Reachability polygons around every hospital from road node travel times.
+
+    A point is inside the T-minute isochrone when 1 min dispatch + road
+    travel + off-road access (at most max_access_km) fits in T minutes, the
+    same model as the response-time grid. The area is resolved on a
+    resolution_km raster. By default every road node belongs to its nearest
+    hospital (the multi-source result), so the polygons of different
+    hospitals do not overlap; per_hospital=True runs a Dijkstra from each
+    hospital instead and returns overlapping reachability areas. node_time
+    and node_hospital from response_time_grid avoid running the multi-source
+    Dijkstra again.
+
+    Returns:
+        gpd.GeoDataFrame: One row per (hospital, minutes) with the hospital's
+        row position in hospitals_gdf, its name if known, and the polygon in
+        EPSG:4326. Empty areas are left out.
+    """
+    coords = np.asarray(graph.coords)
+    thresholds = sorted(thresholds)
+
+    # Equirectangular projection to km around the network's mean latitude
+    lng0, lat0 = coords.mean(axis=0) if len(coords) else (0.0, 0.0)
+    km_per_degree_lon = KM_PER_DEGREE * np.cos(np.radians(lat0))
+    xy = np.column_stack([(coords[:, 0] - lng0) * km_per_degree_lon, (coords[:, 1] - lat0) * KM_PER_DEGREE])
+
+    def to_lng_lat(points):
+        return np.column_stack([points[:, 0] / km_per_degree_lon + lng0, points[:, 1] / KM_PER_DEGREE + lat0])
+
+    start_nodes = hospital_nodes(graph, hospitals_gdf)
+    if per_hospital:
+        # One raster per hospital, each labelled with that hospital only
+        rasters = [(h, _cell_times(xy, times, np.full(len(times), h), thresholds[-1], max_access_km, resolution_km))
+                   for h, times in enumerate(graph.single_source_times(start_nodes, profile))]
+    else:
+        if node_time is None or node_hospital is None:
+            node_time, node_hospital = graph.shortest_paths(start_nodes, profile)
+        raster = _cell_times(xy, node_time, node_hospital, thresholds[-1], max_access_km, resolution_km)
+        rasters = [(h, raster) for h in range(len(hospitals_gdf))]
+
+    names = hospitals_gdf['name'].tolist() if 'name' in hospitals_gdf.columns else [None] * len(hospitals_gdf)
+    rows = []
+    for h, raster in rasters:
+        if raster is None:
+            continue
+        cell_time, cell_origin, (x0, y0) = raster
+        for minutes in thresholds:
+            mask = (cell_origin == h) & (cell_time <= minutes)
+            if not mask.any():
+                continue
+            area = _raster_polygon(mask, x0, y0, resolution_km)
+            rows.append({'hospital': h, 'name': names[h], 'minutes': minutes,
+                         'geometry': shapely.transform(area, to_lng_lat)})
+
+    return gpd.GeoDataFrame(pd.DataFrame(rows, columns=['hospital', 'name', 'minutes', 'geometry']),
+                            geometry='geometry', crs="EPSG:4326")
+
+def export_isochrones(isochrones, path):
+    """Write isochrones as GeoParquet (.parquet) or GeoJSON (anything else)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".parquet"):
+        isochrones.to_parquet(path, index=False)
+    else:
+        isochrones.to_file(path, driver="GeoJSON")
+
+def main():
+    parser = argparse.ArgumentParser(description="Hospital isochrones over the road network")
+    parser.add_argument("--hospitals", default=os.path.join(os.getcwd(), "data", "raw", "sunda_hospital.geojson"))
+    parser.add_argument("--roads", default=os.path.join(os.getcwd(), "data", "raw", "sunda_roads.geojson"))
+    parser.add_argument("--output", default="output/isochrones_sunda.geojson", help=".geojson or .parquet")
+    parser.add_argument("--minutes", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--per-hospital", action="store_true", help="overlapping areas instead of nearest hospital")
+    parser.add_argument("--profile", choices=["distance", "road_type"], default="distance")
+    parser.add_argument("--max-access-km", type=float, default=0.5)
+    args = parser.parse_args()
+
+    hospitals_gdf = gpd.read_file(args.hospitals)
+    roads_gdf = gpd.read_file(args.roads)
+    graph = load_road_graph(args.roads, roads_gdf, profile=args.profile)
+    isochrones = hospital_isochrones(graph, hospitals_gdf, args.minutes, per_hospital=args.per_hospital,
+                                     profile=args.profile, max_access_km=args.max_access_km)
+    export_isochrones(isochrones, args.output)
+    print(f"Saved {len(isochrones)} isochrones to {args.output}")
+
+if __name__ == "__main__":
+    main()
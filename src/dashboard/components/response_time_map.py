@@ -3,77 +3,42 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
 import geopandas as gpd
-from scipy.spatial import cKDTree
-import networkx as nx
-from shapely.geometry import Point, LineString, Polygon
+from shapely.geometry import Polygon
 import pandas as pd
 import os
 
+from .road_graph import RoadGraph, load_road_graph
+# Re-exported: get_road_weight lived in this module before the road graph moved to road_graph.py
+from .road_graph import get_road_weight  # noqa: F401
+
 def create_road_network(roads_gdf):
-    G = nx.Graph()
-    
-    # Add nodes and edges from road segments
-    for idx, row in roads_gdf.iterrows():
-        # Handle different geometry types
-        if isinstance(row.geometry, LineString):
-            coords = list(row.geometry.coords)
-        elif isinstance(row.geometry, Polygon):
-            coords = list(row.geometry.exterior.coords)
-        else:
-            continue  # Skip if not LineString or Polygon
-            
-        for i in range(len(coords) - 1):
-            # Add nodes with their coordinates
-            G.add_node(coords[i], pos=coords[i])
-            G.add_node(coords[i+1], pos=coords[i+1])
-            
-            # Get road type from various possible property names
-            road_type = None
-            for prop in ['highway', 'type', 'street', 'road']:
-                if prop in row and row[prop]:
-                    road_type = row[prop]
-                    break
-            
-            # Add edge with weight based on road type
-            weight = get_road_weight(road_type)
-            G.add_edge(coords[i], coords[i+1], weight=weight)
-    
-    return G
+    """Road network as an nx.Graph keyed by coordinate tuples (see RoadGraph.to_networkx)"""
+    return RoadGraph.from_geodataframe(roads_gdf).to_networkx()
 
-def get_road_weight(road_type):
-    if not road_type:
-        return 5.0  # Default weight for unknown road types
-    
-    # Convert to lowercase for case-insensitive matching
-    road_type = str(road_type).lower()
-    
-    # Assign weights based on road type (minutes per kilometer)
-    # These are estimated average speeds converted to minutes per km
-    weights = {
-        'motorway': 0.5,    # ~120 km/h
-        'trunk': 0.6,       # ~100 km/h
-        'primary': 0.75,    # ~80 km/h
-        'secondary': 1.0,   # ~60 km/h
-        'tertiary': 1.25,   # ~48 km/h
-        'residential': 1.5, # ~40 km/h
-        'service': 2.0,     # ~30 km/h
-        'pedestrian': 5.0,  # ~12 km/h
-        'street': 1.5,      # ~40 km/h
-        'road': 1.5,        # ~40 km/h
-        'multipolygon': 5.0,
-        'unknown': 5.0
-    }
-    
-    # Try to match the road type with our weights
-    for key in weights:
-        if key in road_type:
-            return weights[key]
-    
-    return 5.0  # Default weight if no match found
+def hospital_nodes(graph, hospitals_gdf):
+    """Nearest road node of every hospital (its centroid for polygons)"""
+    centroids = [geometry.centroid if isinstance(geometry, Polygon) else geometry
+                 for geometry in hospitals_gdf.geometry]
+    return graph.nearest_nodes([[c.x, c.y] for c in centroids])
+
+def response_time_grid(hospitals_gdf, roads_gdf, grid_size=100, per_hospital=False, profile="distance", graph=None):
+    """Response time of every grid cell from its nearest hospital.
+
+    One multi-source Dijkstra over the CSR road graph gives the travel time
+    from the nearest hospital and which hospital that is. With
+    per_hospital=True the travel times from every hospital are also computed
+    separately. profile selects the edge weights (see RoadGraph); pass a
+    graph from load_road_graph to skip building it from roads_gdf.
 
-def calculate_response_times(hospitals_gdf, roads_gdf, grid_size=100):
+    Returns:
+        dict: X, Y, response_time (grid_size x grid_size minutes, inf where no
+        road is reachable), nearest_hospital (row position in hospitals_gdf,
+        -1 where unreachable), graph (RoadGraph), profile, node_time and node_hospital
+        (per road node) and, if requested, per_hospital
+        (n_hospitals x grid_size x grid_size)
+    """
     # Create road network
-    G = create_road_network(roads_gdf)
+    graph = graph if graph is not None else RoadGraph.from_geodataframe(roads_gdf)
     
     # Get the bounds of the area
     bounds = roads_gdf.total_bounds
@@ -85,85 +50,70 @@ def calculate_response_times(hospitals_gdf, roads_gdf, grid_size=100):
     X, Y = np.meshgrid(x, y)
     
     # Create response time grid
-    response_times = np.full((grid_size, grid_size), np.inf)
-    
+    result = {
+        'X': X,
+        'Y': Y,
+        'response_time': np.full((grid_size, grid_size), np.inf),
+        'nearest_hospital': np.full((grid_size, grid_size), -1, dtype=np.int64),
+        'graph': graph,
+        'profile': profile,
+        'node_time': np.full(len(graph), np.inf),
+        'node_hospital': np.full(len(graph), -1, dtype=np.int64)
+    }
+    if per_hospital:
+        result['per_hospital'] = np.full((len(hospitals_gdf), grid_size, grid_size), np.inf)
+
     # Get all road nodes
-    road_nodes = list(G.nodes())
-    if not road_nodes:
-        return X, Y, response_times
-        
-    tree = cKDTree([node for node in road_nodes])
-    
-    # Convert edge weights from minutes/km to actual minutes based on distance
-    for u, v, data in G.edges(data=True):
-        # Calculate actual distance in km
-        lat = (u[1] + v[1]) / 2  # Use midpoint latitude
-        km_per_degree_lon = 111.32 * np.cos(np.radians(lat))
-        km_per_degree_lat = 111.32
-        
-        dx = (u[0] - v[0]) * km_per_degree_lon
-        dy = (u[1] - v[1]) * km_per_degree_lat
-        distance_km = np.sqrt(dx**2 + dy**2)
-        
-        # Convert to actual minutes (assuming 60 km/h = 1 km/min average speed)
-        G[u][v]['weight'] = distance_km
-    
-    # For each hospital, calculate response times
-    for _, hospital in hospitals_gdf.iterrows():
-        # Get hospital centroid
-        if isinstance(hospital.geometry, Polygon):
-            hospital_centroid = hospital.geometry.centroid
-        else:
-            hospital_centroid = hospital.geometry
-            
-        # Find nearest road node to hospital
-        _, nearest_idx = tree.query([hospital_centroid.x, hospital_centroid.y])
-        start_node = road_nodes[nearest_idx]
-        
-        # Calculate shortest paths from hospital to all other nodes
-        lengths = nx.single_source_dijkstra_path_length(G, start_node)
-        
-        # Update response times grid
-        for i in range(grid_size):
-            for j in range(grid_size):
-                point = Point(X[i, j], Y[i, j])
-                
-                # Find nearest road node
-                _, nearest_idx = tree.query([point.x, point.y])
-                nearest_node = road_nodes[nearest_idx]
-                
-                if nearest_node in lengths:
-                    # Calculate straight-line distance to nearest road (in km)
-                    lat = point.y
-                    km_per_degree_lon = 111.32 * np.cos(np.radians(lat))
-                    km_per_degree_lat = 111.32
-                    
-                    # Calculate access distance (distance to nearest road)
-                    dx = (point.x - nearest_node[0]) * km_per_degree_lon
-                    dy = (point.y - nearest_node[1]) * km_per_degree_lat
-                    access_distance = np.sqrt(dx**2 + dy**2)
-                    
-                    # Calculate road network distance (in km)
-                    road_distance = lengths[nearest_node]  # Already in km
-                    
-                    # Calculate response time:
-                    # 1. Initial dispatch time: 1 minute
-                    # 2. Road travel time: 60 km/h = 1 km/min
-                    # 3. Access time: 30 km/h = 0.5 km/min for off-road
-                    response_time = (
-                        1 +  # Dispatch time
-                        road_distance +  # Road travel time (1 min/km)
-                        (access_distance * 2)  # Access time (2 min/km for off-road)
-                    )
-                    
-                    response_times[i, j] = min(response_times[i, j], response_time)
-    
+    if len(graph) == 0 or len(hospitals_gdf) == 0:
+        return result
+
+    # Nearest road node of every grid cell, in one batched query
+    cells = np.column_stack([X.ravel(), Y.ravel()])
+    nearest = graph.nearest_nodes(cells)
+
+    # Calculate access distance (straight-line distance to nearest road, in km)
+    km_per_degree_lon = 111.32 * np.cos(np.radians(cells[:, 1]))
+    km_per_degree_lat = 111.32
+    dx = (cells[:, 0] - graph.coords[nearest, 0]) * km_per_degree_lon
+    dy = (cells[:, 1] - graph.coords[nearest, 1]) * km_per_degree_lat
+    access_distance = np.sqrt(dx**2 + dy**2)
+
+    # Find nearest road node to each hospital
+    start_nodes = hospital_nodes(graph, hospitals_gdf)
+
+    def cell_response_times(road_distance):
+        # Calculate response time:
+        # 1. Initial dispatch time: 1 minute
+        # 2. Road travel time: 60 km/h = 1 km/min
+        # 3. Access time: 30 km/h = 0.5 km/min for off-road
+        return (
+            1 +  # Dispatch time
+            road_distance[nearest] +  # Road travel time (1 min/km)
+            (access_distance * 2)  # Access time (2 min/km for off-road)
+        ).reshape(grid_size, grid_size)
+
+    # All hospitals at once: distance and origin of the closest one
+    node_time, node_hospital = graph.shortest_paths(start_nodes, profile)
+    result['node_time'], result['node_hospital'] = node_time, node_hospital
+    result['response_time'] = cell_response_times(node_time)
+    result['nearest_hospital'] = node_hospital[nearest].reshape(grid_size, grid_size)
+
+    if per_hospital:
+        for i, road_distance in enumerate(graph.single_source_times(start_nodes, profile)):
+            result['per_hospital'][i] = cell_response_times(road_distance)
+
+    return result
+
+def calculate_response_times(hospitals_gdf, roads_gdf, grid_size=100, graph=None):
+    result = response_time_grid(hospitals_gdf, roads_gdf, grid_size=grid_size, graph=graph)
+    response_times = result['response_time']
+
     # Print some statistics for debugging
     print(f"Min response time: {np.min(response_times):.2f} minutes")
     print(f"Max response time: {np.max(response_times):.2f} minutes")
     print(f"Mean response time: {np.mean(response_times):.2f} minutes")
     
-    return X, Y, response_times
+    return result['X'], result['Y'], response_times
 
 def create_response_time_map(disaster="Joplin Tornado"):
     # Get the current working directory
@@ -189,10 +139,14 @@ def create_response_time_map(disaster="Joplin Tornado"):
     
     # Load data
     hospitals_gdf = gpd.read_file(os.path.join(current_dir, "data", "raw", hospitals_file))
-    roads_gdf = gpd.read_file(os.path.join(current_dir, "data", "raw", roads_file))
+    roads_path = os.path.join(current_dir, "data", "raw", roads_file)
+    roads_gdf = gpd.read_file(roads_path)
+    
+    # Routing graph from the on-disk cache (built on the first run)
+    graph = load_road_graph(roads_path, roads_gdf)
     
     # Calculate response times
-    X, Y, response_times = calculate_response_times(hospitals_gdf, roads_gdf)
+    X, Y, response_times = calculate_response_times(hospitals_gdf, roads_gdf, graph=graph)
     
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -0,0 +1,284 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import networkx as nx
+import shapely
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.spatial import cKDTree
+
+LINESTRING_TYPE_ID = 1
+POLYGON_TYPE_ID = 3
+ROAD_TYPE_COLUMNS = ['highway', 'type', 'street', 'road']
+KM_PER_DEGREE = 111.32
+# Bump when the graph construction or the on-disk layout changes
+GRAPH_FORMAT_VERSION = 1
+
+def get_road_weight(road_type):
+    if not road_type:
+        return 5.0  # Default weight for unknown road types
+
+    # Convert to lowercase for case-insensitive matching
+    road_type = str(road_type).lower()
+
+    # Assign weights based on road type (minutes per kilometer)
+    # These are estimated average speeds converted to minutes per km
+    weights = {
+        'motorway': 0.5,    # ~120 km/h
+        'trunk': 0.6,       # ~100 km/h
+        'primary': 0.75,    # ~80 km/h
+        'secondary': 1.0,   # ~60 km/h
+        'tertiary': 1.25,   # ~48 km/h
+        'residential': 1.5, # ~40 km/h
+        'service': 2.0,     # ~30 km/h
+        'pedestrian': 5.0,  # ~12 km/h
+        'street': 1.5,      # ~40 km/h
+        'road': 1.5,        # ~40 km/h
+        'multipolygon': 5.0,
+        'unknown': 5.0
+    }
+
+    # Try to match the road type with our weights
+    for key in weights:
+        if key in road_type:
+            return weights[key]
+
+    return 5.0  # Default weight if no match found
+
+def km_distance(a, b):
+    """Equirectangular distance in km between (N, 2) lng/lat arrays, at their midpoint latitude"""
+    lat = (a[:, 1] + b[:, 1]) / 2
+    dx = (a[:, 0] - b[:, 0]) * KM_PER_DEGREE * np.cos(np.radians(lat))
+    dy = (a[:, 1] - b[:, 1]) * KM_PER_DEGREE
+    return np.sqrt(dx**2 + dy**2)
+
+def _road_types(roads_gdf):
+    """Road type of every row: the first non-empty value among ROAD_TYPE_COLUMNS"""
+    road_types = np.full(len(roads_gdf), None, dtype=object)
+    for column in ROAD_TYPE_COLUMNS:
+        if column not in roads_gdf.columns:
+            continue
+        values = roads_gdf[column].to_numpy(dtype=object)
+        missing = np.array([not value for value in road_types], dtype=bool)
+        present = np.array([value is not None and value == value and bool(value) for value in values], dtype=bool)
+        road_types[missing & present] = values[missing & present]
+    return road_types
+
+def road_file_sha1(path, chunk_size=1 << 20):
+    """SHA-1 hex digest of a road file, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def graph_cache_key(roads_path, profile="distance"):
+    """Cache key of the graph built from roads_path: road file content, weighting profile and format version"""
+    content = f"{road_file_sha1(roads_path)}:{profile}:{GRAPH_FORMAT_VERSION}"
+    return hashlib.sha1(content.encode()).hexdigest()[:20]
+
+class RoadGraph:
+    """Undirected road graph with integer node ids and a CSR adjacency.
+
+    Nodes are the distinct vertices of the road geometries (coords, (N, 2)
+    lng/lat); every pair of consecutive vertices is an edge (edges, (E, 2)
+    with u < v) with its length in km and the minutes per km of its road
+    type. Weighting profiles turn these into edge weights:
+
+    - "distance": length in km, i.e. minutes at 60 km/h
+    - "road_type": length * minutes per km of the road type
+    """
+
+    PROFILES = ("distance", "road_type")
+
+    def __init__(self, coords, edges, length_km, minutes_per_km):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.length_km = np.asarray(length_km, dtype=np.float64)
+        self.minutes_per_km = np.asarray(minutes_per_km, dtype=np.float64)
+        self._tree = None
+        self._adjacency = {}
+
+    @classmethod
+    def from_geodataframe(cls, roads_gdf):
+        """Build the graph from LineString and Polygon (exterior ring) road geometries"""
+        geoms = np.asarray(roads_gdf.geometry.values, dtype=object)
+        type_ids = shapely.get_type_id(geoms)
+        rows = np.flatnonzero((type_ids == LINESTRING_TYPE_ID) | (type_ids == POLYGON_TYPE_ID))
+        lines = geoms[rows]
+        polygons = type_ids[rows] == POLYGON_TYPE_ID
+        lines[polygons] = shapely.get_exterior_ring(lines[polygons])
+
+        points, owner = shapely.get_coordinates(lines, return_index=True)
+        if len(points) == 0:
+            return cls(np.empty((0, 2)), np.empty((0, 2)), np.empty(0), np.empty(0))
+
+        # Node ids in order of first appearance; identical coordinates share a node
+        unique, first, inverse = np.unique(points, axis=0, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        node_ids = rank[inverse.reshape(-1)]
+        coords = unique[order]
+
+        # Consecutive vertices of the same geometry form an edge
+        same = owner[:-1] == owner[1:]
+        u, v = node_ids[:-1][same], node_ids[1:][same]
+        segment_rows = rows[owner[:-1][same]]
+        keep = u != v
+        u, v, segment_rows = u[keep], v[keep], segment_rows[keep]
+
+        road_types = _road_types(roads_gdf)
+        weight_of_type = {}
+        minutes_per_km = np.empty(len(segment_rows))
+        for i, road_type in enumerate(road_types[segment_rows]):
+            if road_type not in weight_of_type:
+                weight_of_type[road_type] = get_road_weight(road_type)
+            minutes_per_km[i] = weight_of_type[road_type]
+
+        # Collapse repeated segments; like nx.Graph, the last one sets the road type
+        pairs = np.column_stack([np.minimum(u, v), np.maximum(u, v)])
+        _, last = np.unique(pairs[::-1], axis=0, return_index=True)
+        last = np.sort(len(pairs) - 1 - last)
+        edges = pairs[last]
+        return cls(coords, edges, km_distance(coords[edges[:, 0]], coords[edges[:, 1]]), minutes_per_km[last])
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = cKDTree(self.coords)
+        return self._tree
+
+    def nearest_nodes(self, points):
+        """Id of the closest node to every (lng, lat) point"""
+        _, nearest = self.tree.query(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        return nearest
+
+    def edge_weights(self, profile="distance"):
+        if profile == "distance":
+            return self.length_km
+        if profile == "road_type":
+            return self.length_km * self.minutes_per_km
+        raise ValueError(f"Unknown weighting profile '{profile}', expected one of {self.PROFILES}")
+
+    def adjacency(self, profile="distance"):
+        """Symmetric (N, N) CSR matrix of edge weights"""
+        if profile not in self._adjacency:
+            weights = self.edge_weights(profile)
+            u, v = self.edges[:, 0], self.edges[:, 1]
+            self._adjacency[profile] = sparse.csr_matrix(
+                (np.r_[weights, weights], (np.r_[u, v], np.r_[v, u])), shape=(len(self), len(self)))
+        return self._adjacency[profile]
+
+    def shortest_paths(self, sources, profile="distance"):
+        """Travel time from the closest of the source nodes, in one multi-source Dijkstra.
+
+        Returns:
+            tuple: (time, source) arrays over nodes; source is the position
+            in sources of the closest one (the first if several share a node),
+            inf and -1 where unreachable
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        time = np.full(len(self), np.inf)
+        origin = np.full(len(self), -1, dtype=np.int64)
+        if len(sources) == 0 or len(self) == 0:
+            return time, origin
+
+        unique_sources, first = np.unique(sources, return_index=True)
+        time, _, reached_from = csgraph.dijkstra(self.adjacency(profile), directed=False, indices=unique_sources,
+                                                 min_only=True, return_predecessors=True)
+        reached = reached_from >= 0
+        position = dict(zip(unique_sources.tolist(), first.tolist()))
+        origin[reached] = [position[node] for node in reached_from[reached].tolist()]
+        return time, origin
+
+    def single_source_times(self, sources, profile="distance"):
+        """(len(sources), N) travel times from each source node separately"""
+        sources = np.asarray(sources, dtype=np.int64)
+        if len(sources) == 0:
+            return np.empty((0, len(self)))
+        return csgraph.dijkstra(self.adjacency(profile), directed=False, indices=sources).reshape(len(sources), -1)
+
+    def save(self, directory, profile="distance"):
+        """Write the graph and the CSR adjacency of profile as .npy files that load() can memory-map.
+
+        The files are written to a temporary directory that is renamed into
+        place, so readers never see a partial graph.
+        """
+        adjacency = self.adjacency(profile)
+        tmp_dir = f"{directory}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        arrays = {
+            'coords': self.coords, 'edges': self.edges,
+            'length_km': self.length_km, 'minutes_per_km': self.minutes_per_km,
+            'indptr': adjacency.indptr, 'indices': adjacency.indices, 'data': adjacency.data
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({'profile': profile, 'version': GRAPH_FORMAT_VERSION,
+                       'nodes': len(self), 'edges': len(self.edges)}, f)
+        try:
+            os.replace(tmp_dir, directory)
+        except OSError:
+            # Another process cached the same graph first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a graph written by save(); arrays are memory-mapped unless mmap=False"""
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get('version') != GRAPH_FORMAT_VERSION:
+            raise ValueError(f"{directory} holds graph format {meta.get('version')}, expected {GRAPH_FORMAT_VERSION}")
+
+        def array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+
+        graph = cls(array('coords'), array('edges'), array('length_km'), array('minutes_per_km'))
+        graph._adjacency[meta['profile']] = sparse.csr_matrix(
+            (array('data'), array('indices'), array('indptr')), shape=(meta['nodes'], meta['nodes']))
+        return graph
+
+    def to_networkx(self):
+        """nx.Graph keyed by coordinate tuples, as create_road_network used to build, for debugging"""
+        G = nx.Graph()
+        nodes = [tuple(c) for c in self.coords.tolist()]
+        G.add_nodes_from((node, {'pos': node}) for node in nodes)
+        G.add_edges_from(
+            (nodes[u], nodes[v], {'weight': w, 'length_km': length})
+            for (u, v), w, length in zip(self.edges.tolist(), self.minutes_per_km.tolist(), self.length_km.tolist())
+        )
+        return G
+
+def load_road_graph(roads_path, roads_gdf=None, profile="distance", cache_dir=None):
+    """RoadGraph of a road file, from the on-disk cache when it was built before.
+
+    Graphs are cached under cache_dir (default data/processed/road_graphs)
+    keyed by the road file's content hash and the weighting profile, so
+    editing the file or changing the profile builds a new entry. roads_gdf
+    avoids reading the file again when it is already loaded.
+    """
+    cache_dir = cache_dir or os.path.join(os.getcwd(), "data", "processed", "road_graphs")
+    directory = os.path.join(cache_dir, graph_cache_key(roads_path, profile))
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        try:
+            return RoadGraph.load(directory)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable road graph cache {directory}: {e}")
+    # Leftovers of an interrupted or outdated entry would block the rename in save()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    if roads_gdf is None:
+        import geopandas as gpd
+        roads_gdf = gpd.read_file(roads_path)
+    graph = RoadGraph.from_geodataframe(roads_gdf)
+    os.makedirs(cache_dir, exist_ok=True)
+    graph.save(directory, profile)
+    return graph
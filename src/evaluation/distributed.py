@@ -0,0 +1,184 @@
+import os
+import json
+import hashlib
+import argparse
+from datetime import timedelta
+
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from src.models.classifier import load_model, ARCHITECTURES, MODEL_VARIANTS
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.evaluation.pipeline import list_label_files, run_pipeline
+from src.evaluation.reports import save_accumulated_metrics
+from src.evaluation.geo_export import merge_prediction_files
+from src.evaluation.writers import PREDICTION_COLUMNS, IMAGE_FORMATS
+
+def shard_label_files(json_files, rank, world_size):
+    """Label files owned by rank.
+
+    The owner depends only on the file name, so shards are identical on every
+    node and adding scenes does not move existing ones to another rank.
+    """
+    return [f for f in json_files if int(hashlib.sha1(f.encode()).hexdigest(), 16) % world_size == rank]
+
+def shard_dir(output_dir, rank):
+    return os.path.join(output_dir, "shards", f"rank_{rank:03d}")
+
+def check_shard_layout(output_dir, world_size):
+    """Refuse to reuse shard outputs written with a different number of ranks.
+
+    Shard membership depends on world_size, so resuming with another value
+    would leave the old rows of moved scenes in their previous shard and the
+    merge would count them twice.
+    """
+    path = os.path.join(output_dir, "shards", "layout.json")
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        previous = json.load(f)['world_size']
+    if previous != world_size:
+        raise ValueError(f"{os.path.dirname(path)} was written with world_size={previous}, not {world_size}; "
+                         f"pass --restart or use the same world size")
+
+def write_shard_layout(output_dir, world_size):
+    directory = os.path.join(output_dir, "shards")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "layout.json"), "w") as f:
+        json.dump({'world_size': world_size}, f)
+
+def merge_shards(output_dir, world_size, metrics=None):
+    """Combine the per-rank outputs into the files visualize_predictions writes.
+
+    building_predictions.csv is the concatenation of the shard CSVs (ordered
+    by scene); the confusion matrix is the sum of the shard matrices unless an
+    already reduced accumulator is passed in. Shard GeoParquet files, when
+    written, are merged into building_predictions.parquet the same way.
+
+    Returns:
+        pd.DataFrame: Performance metrics over all shards
+    """
+    frames = []
+    merged = ConfusionMatrixAccumulator()
+    for rank in range(world_size):
+        directory = shard_dir(output_dir, rank)
+        csv_path = os.path.join(directory, 'building_predictions.csv')
+        if os.path.exists(csv_path):
+            frames.append(pd.read_csv(csv_path))
+        matrix_path = os.path.join(directory, 'confusion_matrix.json')
+        if metrics is None and os.path.exists(matrix_path):
+            merged.merge(ConfusionMatrixAccumulator.load(matrix_path))
+
+    predictions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PREDICTION_COLUMNS)
+    predictions = predictions.sort_values('image_name', kind='stable')
+    predictions.to_csv(os.path.join(output_dir, 'building_predictions.csv'), index=False)
+    merge_prediction_files([os.path.join(shard_dir(output_dir, rank), 'building_predictions.parquet')
+                            for rank in range(world_size)], os.path.join(output_dir, 'building_predictions.parquet'))
+
+    metrics = metrics if metrics is not None else merged
+    metrics.save(os.path.join(output_dir, 'confusion_matrix.json'))
+    return save_accumulated_metrics(metrics, output_dir)
+
+def evaluate_rank(rank, world_size, rendezvous_path, checkpoint_path, json_dir, image_dir, output_dir,
+                  variant="eager", architecture="resnet50", num_workers=None, batch_size=64, threads=None,
+                  render=True, resume=True, image_format="png", quality=None, geoparquet=False):
+    """Score this rank's shard, then all-reduce the confusion matrices over gloo and merge on rank 0.
+
+    Ranks meet through a file:// rendezvous, which only needs a path every
+    rank (local processes or nodes on a shared filesystem) can reach.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    dist.init_process_group("gloo", init_method=f"file://{os.path.abspath(rendezvous_path)}",
+                            rank=rank, world_size=world_size, timeout=timedelta(hours=12))
+    try:
+        if resume:
+            check_shard_layout(output_dir, world_size)
+        # Every rank has checked the old layout before rank 0 replaces it
+        dist.barrier()
+        if rank == 0:
+            write_shard_layout(output_dir, world_size)
+
+        model, device = load_model(checkpoint_path, variant=variant, architecture=architecture)
+        json_files = shard_label_files(list_label_files(json_dir), rank, world_size)
+        print(f"[rank {rank}/{world_size}] scoring {len(json_files)} scenes")
+
+        directory = shard_dir(output_dir, rank)
+        run_pipeline(model, device, json_dir, image_dir, directory, num_workers=num_workers,
+                     batch_size=batch_size, render=render, resume=resume, json_files=json_files,
+                     visualization_dir=output_dir, image_format=image_format, quality=quality,
+                     geo_output=os.path.join(directory, 'building_predictions.parquet') if geoparquet else None)
+
+        # Summing the shard matrices also waits for every rank to finish its CSV
+        matrix = torch.from_numpy(ConfusionMatrixAccumulator.load(os.path.join(directory, 'confusion_matrix.json')).matrix)
+        dist.all_reduce(matrix, op=dist.ReduceOp.SUM)
+
+        if rank == 0:
+            metrics = ConfusionMatrixAccumulator()
+            metrics.matrix[:] = matrix.numpy()
+            metrics_df = merge_shards(output_dir, world_size, metrics)
+            print("\nPerformance Metrics (all shards):")
+            print(metrics_df)
+        dist.barrier()
+    finally:
+        dist.destroy_process_group()
+
+def _local_rank(rank, world_size, kwargs):
+    evaluate_rank(rank, world_size, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded CPU evaluation across processes or nodes")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="eager")
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default="resnet50")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--output", default="output/predictions_visualization")
+    parser.add_argument("--world-size", type=int, default=None, help="total number of ranks across all nodes")
+    parser.add_argument("--rank", type=int, default=None, help="rank of this process (multi-node runs)")
+    parser.add_argument("--local-ranks", type=int, default=None, help="spawn this many ranks on this machine")
+    parser.add_argument("--rendezvous", default=None,
+                        help="file path shared by all ranks, must not exist before the run")
+    parser.add_argument("--workers", type=int, default=None, help="decode workers per rank")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per rank")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--no-render", action="store_true", help="metrics and predictions only")
+    parser.add_argument("--format", choices=list(IMAGE_FORMATS), default="png", help="visualization image format")
+    parser.add_argument("--quality", type=int, default=None, help="JPEG/WebP quality or PNG compression level")
+    parser.add_argument("--geoparquet", action="store_true",
+                        help="also write building_predictions.parquet with probabilities and lng/lat footprints")
+    parser.add_argument("--restart", action="store_true", help="ignore results of earlier runs")
+    parser.add_argument("--merge-only", action="store_true", help="only merge existing shard outputs")
+    args = parser.parse_args()
+
+    world_size = args.world_size or args.local_ranks or 1
+    if args.merge_only:
+        check_shard_layout(args.output, world_size)
+        print(merge_shards(args.output, world_size))
+        return
+
+    rendezvous = args.rendezvous or os.path.join(args.output, "rendezvous")
+    os.makedirs(os.path.dirname(os.path.abspath(rendezvous)), exist_ok=True)
+    cpus = os.cpu_count() or 2
+    kwargs = dict(rendezvous_path=rendezvous, checkpoint_path=args.checkpoint, json_dir=args.labels,
+                  image_dir=args.images, output_dir=args.output, variant=args.variant,
+                  architecture=args.architecture, batch_size=args.batch_size, render=not args.no_render,
+                  resume=not args.restart, image_format=args.format, quality=args.quality,
+                  geoparquet=args.geoparquet)
+
+    if args.rank is None:
+        # Single machine: spawn every rank locally and split the cores between them
+        if os.path.exists(rendezvous):
+            os.remove(rendezvous)
+        kwargs['threads'] = args.threads or max(1, cpus // world_size)
+        kwargs['num_workers'] = args.workers or max(1, cpus // world_size - 1)
+        mp.spawn(_local_rank, args=(world_size, kwargs), nprocs=world_size, join=True)
+    else:
+        kwargs['threads'] = args.threads
+        kwargs['num_workers'] = args.workers
+        evaluate_rank(args.rank, world_size, **kwargs)
+
+if __name__ == "__main__":
+    main()
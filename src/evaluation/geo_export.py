@@ -0,0 +1,121 @@
+import os
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from src.models.classifier import damage_classes
+
+PROBABILITY_COLUMNS = [f"p_{name.replace('-', '_')}" for name in damage_classes]
+
+def lng_lat_footprints(data):
+    """uid -> lng/lat WKT polygon of every building in an xView2 label"""
+    return {
+        feature.get("properties", {}).get("uid"): feature.get("wkt", "")
+        for feature in data.get("features", {}).get("lng_lat", [])
+    }
+
+def read_predictions(path, bbox=None):
+    """Load a prediction GeoParquet file, optionally only the buildings whose centroid lies in bbox.
+
+    Args:
+        bbox (tuple): (min_lng, min_lat, max_lng, max_lat); the filter is pushed
+            down to the Parquet reader, so row groups outside it are skipped.
+    """
+    filters = None
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        filters = [('lng', '>=', min_lng), ('lng', '<=', max_lng), ('lat', '>=', min_lat), ('lat', '<=', max_lat)]
+    return gpd.read_parquet(path, filters=filters)
+
+class GeoPredictionWriter:
+    """Writes per-building predictions with their lng/lat footprint to a GeoParquet file.
+
+    Rows hold image_name, uid, true_label, predicted_label, one probability
+    column per class, the centroid (lng, lat) and the footprint polygon
+    (EPSG:4326). Every scene is written to its own part file under
+    <path>.parts as soon as it is scored, so a killed run loses nothing that
+    was reported as written; close() merges the parts (and, with
+    resume=True, the rows of an existing file) into path.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.parts_dir = path + ".parts"
+        if not resume:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def _part_path(self, image_name):
+        return os.path.join(self.parts_dir, hashlib.sha1(image_name.encode()).hexdigest() + ".parquet")
+
+    def write_scene(self, image_name, uids, true_labels, predicted_labels, footprints, scores):
+        """Write one scene to disk; footprints are the lng/lat WKT strings aligned with uids"""
+        frame = pd.DataFrame({
+            'image_name': image_name,
+            'uid': list(uids),
+            'true_label': list(true_labels),
+            'predicted_label': list(predicted_labels)
+        })
+        scores = np.asarray(scores, dtype=np.float32).reshape(len(frame), len(PROBABILITY_COLUMNS))
+        for i, column in enumerate(PROBABILITY_COLUMNS):
+            frame[column] = scores[:, i]
+
+        geometry = shapely.from_wkt(np.array([f or "POLYGON EMPTY" for f in footprints], dtype=object),
+                                    on_invalid='ignore')
+        # Buildings without a footprint keep a NaN centroid
+        coords, owner = shapely.get_coordinates(shapely.centroid(geometry), return_index=True)
+        centroids = np.full((len(frame), 2), np.nan)
+        centroids[owner] = coords
+        frame['lng'], frame['lat'] = centroids[:, 0], centroids[:, 1]
+
+        part_path = self._part_path(image_name)
+        tmp_path = part_path + ".tmp"
+        gpd.GeoDataFrame(frame, geometry=geometry, crs="EPSG:4326").to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part_path)
+
+    def close(self):
+        """Merge the parts into path atomically and remove them.
+
+        Returns:
+            gpd.GeoDataFrame: Every row in the file
+        """
+        parts = sorted(os.path.join(self.parts_dir, f) for f in os.listdir(self.parts_dir) if f.endswith(".parquet"))
+        tables = [gpd.read_parquet(part) for part in parts]
+        if os.path.exists(self.path):
+            previous = gpd.read_parquet(self.path)
+            rescored = set().union(*(set(t['image_name']) for t in tables)) if tables else set()
+            tables.insert(0, previous[~previous['image_name'].isin(rescored)])
+
+        if tables:
+            table = pd.concat(tables, ignore_index=True)
+        else:
+            table = pd.DataFrame(columns=['image_name', 'uid', 'true_label', 'predicted_label'] + PROBABILITY_COLUMNS
+                                 + ['lng', 'lat', 'geometry'])
+        # Sorted by scene, neighbouring buildings share row groups for bbox filters
+        table = table.sort_values(['image_name', 'uid'], kind='stable').reset_index(drop=True)
+        table = gpd.GeoDataFrame(table, geometry='geometry', crs="EPSG:4326")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        table.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return table
+
+def merge_prediction_files(paths, output_path):
+    """Concatenate prediction GeoParquet files (e.g. the shards of a distributed run)"""
+    tables = [gpd.read_parquet(path) for path in paths if os.path.exists(path)]
+    if not tables:
+        return None
+    table = pd.concat(tables, ignore_index=True).sort_values(['image_name', 'uid'], kind='stable')
+    table = gpd.GeoDataFrame(table.reset_index(drop=True), geometry='geometry', crs="EPSG:4326")
+    tmp_path = output_path + ".tmp"
+    table.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return table
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.models.classifier import damage_classes
+
+class ConfusionMatrixAccumulator:
+    """Running confusion matrix with O(batch) updates and O(1) metric queries.
+
+    Rows are true classes, columns predicted classes. Accumulators from
+    different workers, shards or epochs combine with merge() (or +), and
+    classification_report() returns the same dict as
+    sklearn.metrics.classification_report(..., output_dict=True, zero_division=0).
+    """
+
+    def __init__(self, num_classes=len(damage_classes), class_names=None):
+        self.num_classes = num_classes
+        self.class_names = list(class_names or damage_classes.keys())[:num_classes]
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, true_labels, predicted_labels):
+        true_labels = np.asarray(true_labels, dtype=np.int64).ravel()
+        predicted_labels = np.asarray(predicted_labels, dtype=np.int64).ravel()
+        self.matrix += np.bincount(true_labels * self.num_classes + predicted_labels,
+                                   minlength=self.num_classes ** 2).reshape(self.num_classes, self.num_classes)
+        return self
+
+    def merge(self, other):
+        if other.num_classes != self.num_classes:
+            raise ValueError("cannot merge accumulators with different numbers of classes")
+        self.matrix += other.matrix
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def __add__(self, other):
+        return ConfusionMatrixAccumulator(self.num_classes, self.class_names).merge(self).merge(other)
+
+    def reset(self):
+        self.matrix[:] = 0
+
+    @property
+    def total(self):
+        return int(self.matrix.sum())
+
+    def accuracy(self):
+        return float(np.trace(self.matrix) / self.total) if self.total else 0.0
+
+    def per_class(self):
+        """Precision, recall, f1 and support arrays (0 where undefined)"""
+        true_positive = np.diag(self.matrix).astype(np.float64)
+        support = self.matrix.sum(axis=1)
+        predicted = self.matrix.sum(axis=0)
+
+        precision = np.divide(true_positive, predicted, out=np.zeros_like(true_positive), where=predicted > 0)
+        recall = np.divide(true_positive, support, out=np.zeros_like(true_positive), where=support > 0)
+        denominator = precision + recall
+        f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(true_positive), where=denominator > 0)
+        return precision, recall, f1, support
+
+    def f1(self, average="macro"):
+        _, _, f1, support = self.per_class()
+        if average == "macro":
+            return float(f1.mean())
+        if average == "weighted":
+            return float((f1 * support).sum() / support.sum()) if support.sum() else 0.0
+        raise ValueError(f"unsupported average '{average}'")
+
+    def classification_report(self):
+        precision, recall, f1, support = self.per_class()
+        report = {
+            name: {'precision': precision[i], 'recall': recall[i], 'f1-score': f1[i], 'support': float(support[i])}
+            for i, name in enumerate(self.class_names)
+        }
+        total = support.sum()
+        weights = support / total if total else np.zeros_like(precision)
+        report['accuracy'] = self.accuracy()
+        report['macro avg'] = {'precision': precision.mean(), 'recall': recall.mean(),
+                               'f1-score': f1.mean(), 'support': float(total)}
+        report['weighted avg'] = {'precision': (precision * weights).sum(), 'recall': (recall * weights).sum(),
+                                  'f1-score': (f1 * weights).sum(), 'support': float(total)}
+        return report
+
+    def to_frame(self):
+        """Classification report as the DataFrame written to performance_metrics.csv"""
+        return pd.DataFrame(self.classification_report()).transpose()
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({'class_names': self.class_names, 'matrix': self.matrix.tolist()}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        accumulator = cls(len(data['class_names']), data['class_names'])
+        accumulator.matrix[:] = np.asarray(data['matrix'], dtype=np.int64)
+        return accumulator
+
+    @classmethod
+    def from_predictions_csv(cls, csv_path, chunksize=100000):
+        """Accumulate a building_predictions.csv without loading it whole"""
+        accumulator = cls()
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            accumulator.update(chunk['true_label'].map(damage_classes), chunk['predicted_label'].map(damage_classes))
+        return accumulator
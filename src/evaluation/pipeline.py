@@ -0,0 +1,284 @@
+import os
+import json
+import queue
+import argparse
+
+import cv2
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from src.models.classifier import damage_classes, load_model, ARCHITECTURES, MODEL_VARIANTS
+from src.models.inference import crop_buildings, label_buildings, preprocess_batch
+from src.models.cascade import load_cascade
+from src.evaluation.reports import save_accumulated_metrics
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.evaluation.geo_export import GeoPredictionWriter, lng_lat_footprints
+from src.evaluation.writers import PredictionWriter, VisualizationWriter, IMAGE_FORMATS
+from src.evaluation.prediction_cache import PredictionCache, model_key
+
+def list_label_files(json_dir, num_images=None):
+    """Post-disaster label files in a stable order"""
+    json_files = sorted(f for f in os.listdir(json_dir) if f.endswith(".json") and 'post' in f)
+    return json_files[:num_images] if num_images else json_files
+
+def _decode_worker(json_dir, image_dir, task_queue, scene_queue, render, done_event, prediction_cache=None):
+    """Read, crop and preprocess scenes until a None task arrives.
+
+    Scenes found in the prediction cache are sent with their cached scores
+    and no input batch, so they bypass the model stage; they are only
+    decoded when rendered. Scenes without a readable image are sent as
+    their bare scene name so they can be logged as skipped.
+    """
+    torch.set_num_threads(1)
+    while True:
+        json_file = task_queue.get()
+        if json_file is None:
+            break
+
+        json_path = os.path.join(json_dir, json_file)
+        with open(json_path, "r") as f:
+            data = json.load(f)
+
+        image_name = data.get("metadata", {}).get("img_name")
+        if not image_name:
+            print(f"No image name in {json_file}, skipping.")
+            scene_queue.put(json_file.replace(".json", ".png"))
+            continue
+
+        image_path = os.path.join(image_dir, image_name)
+        image, cache_key, scores, batch = None, None, None, None
+        if prediction_cache is not None and os.path.exists(image_path):
+            # Looked up from the file hashes, so a hit never decodes the scene unless it is drawn
+            cache_key = prediction_cache.scene_key(image_path, json_path)
+            cached = prediction_cache.load_buildings(cache_key, label_buildings(data))
+            if cached is not None:
+                buildings, scores = cached
+
+        if scores is None or render:
+            image = cv2.imread(image_path)
+            if image is None:
+                print(f"Could not load image: {image_name}, skipping.")
+                scene_queue.put(json_file.replace(".json", ".png"))
+                continue
+        if scores is None:
+            buildings = crop_buildings(image, data)
+            batch = preprocess_batch([b['crop'] for b in buildings])
+
+        footprints = lng_lat_footprints(data)
+        meta = [{'building_id': b['building_id'], 'true_label': b['true_label'], 'polygon': b['polygon'],
+                 'lng_lat': footprints.get(b['building_id'])} for b in buildings]
+
+        # Tensors travel through shared memory instead of being pickled
+        scene_queue.put((image_name, torch.from_numpy(image) if render else None, meta, batch, scores, cache_key))
+
+    scene_queue.put(None)
+    # Shared-memory tensors need their producer alive until they are received
+    done_event.wait()
+
+class _ModelStage:
+    """Collects scenes until a full batch is available, then classifies them together"""
+
+    def __init__(self, model, device, batch_size, on_scene):
+        self.model = model
+        self.device = device
+        self.batch_size = batch_size
+        self.on_scene = on_scene
+        self.pending = []
+        self.pending_count = 0
+
+    def add(self, scene):
+        self.pending.append(scene)
+        self.pending_count += len(scene[2])
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        inputs = torch.cat([scene[3] for scene in self.pending])
+        scores = []
+        with torch.inference_mode():
+            for start in range(0, len(inputs), self.batch_size):
+                outputs = self.model(inputs[start:start + self.batch_size].to(self.device))
+                scores.append(torch.softmax(outputs, dim=1).float().cpu().numpy())
+        scores = np.concatenate(scores) if scores else np.empty((0, len(damage_classes)), dtype=np.float32)
+
+        start = 0
+        for scene in self.pending:
+            end = start + len(scene[2])
+            self.on_scene(scene, scores[start:end])
+            start = end
+        self.pending, self.pending_count = [], 0
+
+def run_pipeline(model, device, json_dir, image_dir, output_dir, num_workers=None, batch_size=64,
+                 queue_size=8, num_images=None, render=True, resume=True, prediction_cache=None,
+                 json_files=None, visualization_dir=None, image_format="png", quality=None, geo_output=None):
+    """Pipelined scene inference: decode/crop workers -> batched model -> streaming writers.
+
+    Decode workers feed a bounded queue; the model stage fills batches across
+    scenes; predictions are appended to building_predictions.csv scene by
+    scene and visualizations are written by a thread pool. With resume=True
+    scenes already completed by an earlier (possibly crashed) run are skipped.
+    With a PredictionCache, scenes scored before by the same model skip the
+    model stage and newly scored scenes are added to the cache. json_files
+    restricts the run to the given label files (e.g. one shard) and
+    visualization_dir redirects the rendered scenes, which are encoded as
+    image_format (png, jpeg or webp) with the given quality. render=False
+    only computes predictions and metrics. geo_output additionally writes a
+    GeoParquet file of the predictions with class probabilities and lng/lat
+    footprints (src/evaluation/geo_export.py). Scenes without an image name
+    or a readable image are logged as done without rows, so a resumed run
+    does not retry them; use resume=False after fixing them.
+
+    Returns:
+        pd.DataFrame: Performance metrics over every scene in the CSV. The
+        raw confusion matrix is also saved as confusion_matrix.json so runs
+        over different shards can be merged.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+    class_names = list(damage_classes.keys())
+
+    predictions = PredictionWriter(os.path.join(output_dir, 'building_predictions.csv'), resume=resume)
+    # Start from the scenes an earlier run already completed
+    metrics = ConfusionMatrixAccumulator.from_predictions_csv(predictions.csv_path)
+    visualizations = VisualizationWriter(visualization_dir or output_dir, image_format=image_format,
+                                         quality=quality) if render else None
+    geo_predictions = GeoPredictionWriter(geo_output, resume=resume) if geo_output else None
+
+    if json_files is None:
+        json_files = list_label_files(json_dir, num_images)
+    json_files = [f for f in json_files if f.replace(".json", ".png") not in predictions.completed_scenes]
+    print(f"Scoring {len(json_files)} scenes with {num_workers} decode workers "
+          f"({len(predictions.completed_scenes)} already done)")
+
+    def on_scene(scene, scores):
+        image_name, image, meta, _, cached_scores, cache_key = scene
+        if prediction_cache is not None and cached_scores is None:
+            prediction_cache.save(cache_key, [m['building_id'] for m in meta], scores)
+        predicted_classes = scores.argmax(axis=1)
+        predicted_labels = [class_names[c] for c in predicted_classes]
+        metrics.update([damage_classes[m['true_label']] for m in meta], predicted_classes)
+        if geo_predictions is not None:
+            # On disk before the CSV log marks the scene done, so a resumed run never misses its geo rows
+            geo_predictions.write_scene(image_name, [m['building_id'] for m in meta], [m['true_label'] for m in meta],
+                                        predicted_labels, [m['lng_lat'] for m in meta], scores)
+        predictions.write_scene(image_name, [
+            {'image_name': image_name, 'building_id': m['building_id'],
+             'true_label': m['true_label'], 'predicted_label': label}
+            for m, label in zip(meta, predicted_labels)
+        ])
+        if visualizations is not None:
+            visualizations.submit(image.numpy().copy(), image_name, [m['polygon'] for m in meta], predicted_labels)
+
+    ctx = mp.get_context("spawn")
+    task_queue = ctx.Queue()
+    scene_queue = ctx.Queue(maxsize=queue_size)
+    done_event = ctx.Event()
+    for json_file in json_files:
+        task_queue.put(json_file)
+    for _ in range(num_workers):
+        task_queue.put(None)
+
+    workers = [ctx.Process(target=_decode_worker, args=(json_dir, image_dir, task_queue, scene_queue, render, done_event,
+                                                               prediction_cache),
+                           daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    stage = _ModelStage(model, device, batch_size, on_scene)
+    finished, num_scenes, cached_scenes, skipped_scenes = 0, 0, 0, 0
+    try:
+        while finished < num_workers:
+            try:
+                scene = scene_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    print("Warning: decode workers exited early")
+                    break
+                continue
+            if scene is None:
+                finished += 1
+                continue
+            if isinstance(scene, str):
+                predictions.write_scene(scene, [])
+                skipped_scenes += 1
+                continue
+            num_scenes += 1
+            if scene[4] is not None:
+                cached_scenes += 1
+                on_scene(scene, scene[4])
+            else:
+                stage.add(scene)
+        stage.flush()
+    finally:
+        done_event.set()
+        predictions.close()
+        if visualizations is not None:
+            visualizations.close()
+        if geo_predictions is not None:
+            geo_predictions.close()
+        for worker in workers:
+            worker.join(timeout=5)
+
+    if skipped_scenes:
+        print(f"Skipped {skipped_scenes} scenes without a readable image (logged as done)")
+    if prediction_cache is not None:
+        print(f"Prediction cache: {cached_scenes} of {num_scenes} scenes served without the model")
+    metrics.save(os.path.join(output_dir, 'confusion_matrix.json'))
+    return save_accumulated_metrics(metrics, output_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined multi-process damage inference")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="eager")
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default="resnet50",
+                        help="resnet50 teacher or a distilled student backbone (src/models/distill.py)")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/sample/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/sample/images"))
+    parser.add_argument("--output", default="output/predictions_visualization")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--num-images", type=int, default=None)
+    parser.add_argument("--no-render", action="store_true", help="metrics and predictions only")
+    parser.add_argument("--format", choices=list(IMAGE_FORMATS), default="png", help="visualization image format")
+    parser.add_argument("--quality", type=int, default=None, help="JPEG/WebP quality or PNG compression level")
+    parser.add_argument("--restart", action="store_true", help="ignore results of earlier runs")
+    parser.add_argument("--screening-checkpoint", default=None,
+                        help="run as a cascade behind this first-stage model (src/models/cascade.py)")
+    parser.add_argument("--threshold", type=float, default=0.9, help="cascade no-damage early-exit threshold")
+    parser.add_argument("--geoparquet", action="store_true",
+                        help="also write building_predictions.parquet with probabilities and lng/lat footprints")
+    parser.add_argument("--prediction-cache", default=None,
+                        help="directory of cached per-scene predictions, e.g. data/processed/predictions")
+    args = parser.parse_args()
+
+    if args.screening_checkpoint:
+        model, device = load_cascade(args.screening_checkpoint, args.checkpoint, args.threshold, args.variant,
+                                     architecture=args.architecture)
+    else:
+        model, device = load_model(args.checkpoint, variant=args.variant, architecture=args.architecture)
+
+    prediction_cache = None
+    if args.prediction_cache:
+        if args.screening_checkpoint:
+            key = model_key(args.checkpoint, args.screening_checkpoint, variant=args.variant, threshold=args.threshold,
+                            architecture=args.architecture)
+        else:
+            key = model_key(args.checkpoint, variant=args.variant, architecture=args.architecture)
+        prediction_cache = PredictionCache(args.prediction_cache, key)
+
+    metrics_df = run_pipeline(model, device, args.labels, args.images, args.output,
+                              num_workers=args.workers, batch_size=args.batch_size,
+                              num_images=args.num_images, render=not args.no_render,
+                              resume=not args.restart, prediction_cache=prediction_cache,
+                              image_format=args.format, quality=args.quality,
+                              geo_output=os.path.join(args.output, 'building_predictions.parquet') if args.geoparquet else None)
+    print("\nPerformance Metrics:")
+    print(metrics_df)
+    if args.screening_checkpoint:
+        print(f"Cascade escalation rate: {model.escalation_rate:.2%}")
+
+if __name__ == "__main__":
+    main()
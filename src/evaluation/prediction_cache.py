@@ -0,0 +1,91 @@
+import os
+import hashlib
+
+import numpy as np
+
+from src.models.inference import PREPROCESSING_VERSION
+from src.utils.hashing import file_sha1
+
+def model_key(*checkpoint_paths, **options):
+    """Fingerprint of the checkpoint files and any options that change predictions (variant, threshold, ...)"""
+    parts = [file_sha1(path) for path in checkpoint_paths]
+    parts += [f"{name}={value}" for name, value in sorted(options.items())]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+class PredictionCache:
+    """Persistent per-scene prediction cache addressed by content hashes.
+
+    An entry is keyed by the SHA-1 of the scene image, of its label JSON, the
+    model key and PREPROCESSING_VERSION, so it is never stale: changing any
+    of them simply leads to a different key. Entries are small .npz files
+    holding the building ids and class scores of one scene, written
+    atomically so concurrent runners can share a cache directory.
+    """
+
+    def __init__(self, cache_dir, model_key):
+        self.cache_dir = cache_dir
+        self.model_key = model_key
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def scene_key(self, image_path, label_path):
+        parts = [file_sha1(image_path), file_sha1(label_path), self.model_key, str(PREPROCESSING_VERSION)]
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npz")
+
+    def _read(self, key):
+        try:
+            with np.load(self._path(key)) as entry:
+                return list(entry['building_ids']), entry['scores']
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def load(self, key, building_ids=None):
+        """Cached (N, num_classes) scores for a scene key, or None.
+
+        When building_ids is given the entry must list the same buildings in
+        the same order, otherwise it is treated as a miss.
+        """
+        entry = self._read(key)
+        if entry is None or (building_ids is not None and entry[0] != list(building_ids)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def load_buildings(self, key, buildings):
+        """Cached scores matched to a scene's label buildings, before the scene is decoded.
+
+        buildings come from label_buildings(); the entry holds the subset that
+        was scored (buildings with an empty crop are left out), in order.
+
+        Returns:
+            tuple: (scored buildings, scores), or None on a miss
+        """
+        entry = self._read(key)
+        if entry is not None:
+            scored, remaining = [], iter(buildings)
+            for building_id in entry[0]:
+                building = next((b for b in remaining if b['building_id'] == building_id), None)
+                if building is None:
+                    break
+                scored.append(building)
+            else:
+                self.hits += 1
+                return scored, entry[1]
+        self.misses += 1
+        return None
+
+    def save(self, key, building_ids, scores):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, building_ids=np.asarray(building_ids, dtype=str), scores=np.asarray(scores, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
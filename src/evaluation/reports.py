@@ -0,0 +1,55 @@
+import os
+import cv2
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from src.models.classifier import damage_classes
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+
+# Define damage colors
+damage_colors = {
+    "no-damage": (0, 255, 0),      # Green
+    "minor-damage": (255, 255, 0), # Yellow
+    "major-damage": (255, 165, 0), # Orange
+    "destroyed": (255, 0, 0)       # Red
+}
+
+def draw_predictions(vis_image, polygons, predicted_labels):
+    """Draw each building polygon and its predicted label in the label color"""
+    for polygon, predicted_label in zip(polygons, predicted_labels):
+        pred_color = damage_colors[predicted_label]
+
+        # Draw polygon with predicted label color
+        pts = polygon.reshape((-1, 1, 2)).astype(np.int32)
+        cv2.polylines(vis_image, [pts], isClosed=True, color=pred_color, thickness=2)
+
+        # Add predicted label
+        centroid = np.mean(polygon, axis=0).astype(int)
+        cv2.putText(vis_image, predicted_label, tuple(centroid),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, pred_color, 1, cv2.LINE_AA)
+    return vis_image
+
+def save_confusion_matrix(cm, output_dir):
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
+                xticklabels=damage_classes.keys(),
+                yticklabels=damage_classes.keys())
+    plt.title('Confusion Matrix')
+    plt.ylabel('True Label')
+    plt.xlabel('Predicted Label')
+    plt.savefig(os.path.join(output_dir, 'confusion_matrix.png'))
+    plt.close()
+
+def save_metrics(all_true_labels, all_predicted_labels, output_dir):
+    """Write performance_metrics.csv and confusion_matrix.png, return the metrics DataFrame"""
+    accumulator = ConfusionMatrixAccumulator().update(all_true_labels, all_predicted_labels)
+    return save_accumulated_metrics(accumulator, output_dir)
+
+def save_accumulated_metrics(accumulator, output_dir):
+    """save_metrics for a ConfusionMatrixAccumulator"""
+    metrics_df = accumulator.to_frame()
+    metrics_df.to_csv(os.path.join(output_dir, 'performance_metrics.csv'))
+
+    save_confusion_matrix(accumulator.matrix, output_dir)
+    return metrics_df
@@ -0,0 +1,135 @@
+import os
+import csv
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src.evaluation.reports import draw_predictions
+
+PREDICTION_COLUMNS = ['image_name', 'building_id', 'true_label', 'predicted_label']
+
+# format -> (file extension, cv2 encoder parameter, default value). For PNG the
+# value is the zlib compression level (0-9), for JPEG and WebP the quality (1-100).
+IMAGE_FORMATS = {
+    'png': ('.png', cv2.IMWRITE_PNG_COMPRESSION, 1),
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 90),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, 90)
+}
+
+class PredictionWriter:
+    """Appends building predictions to a CSV from a background thread.
+
+    Every scene is written and flushed in one go, then its image name is
+    appended to a completion log. After a crash, open the writer again with
+    resume=True: rows of scenes missing from the log are dropped and
+    completed_scenes tells the caller which scenes to skip.
+    """
+
+    def __init__(self, csv_path, resume=True, max_pending=64):
+        self.csv_path = csv_path
+        self.log_path = csv_path + ".done"
+        self.completed_scenes = set()
+
+        if resume and os.path.exists(self.csv_path) and os.path.exists(self.log_path):
+            with open(self.log_path, "r") as f:
+                self.completed_scenes = {line.strip() for line in f if line.strip()}
+            self._drop_incomplete_rows()
+        else:
+            with open(self.csv_path, "w", newline="") as f:
+                csv.writer(f).writerow(PREDICTION_COLUMNS)
+            open(self.log_path, "w").close()
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _drop_incomplete_rows(self):
+        with open(self.csv_path, "r", newline="") as f:
+            rows = [row for row in csv.DictReader(f) if row.get('image_name') in self.completed_scenes]
+        tmp_path = self.csv_path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PREDICTION_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.csv_path)
+
+    def _run(self):
+        with open(self.csv_path, "a", newline="") as csv_file, open(self.log_path, "a") as log_file:
+            writer = csv.DictWriter(csv_file, fieldnames=PREDICTION_COLUMNS)
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                image_name, rows = item
+                try:
+                    writer.writerows(rows)
+                    csv_file.flush()
+                    os.fsync(csv_file.fileno())
+                    log_file.write(image_name + "\n")
+                    log_file.flush()
+                except Exception as e:  # surfaced in close()
+                    self._error = e
+                    break
+
+    def write_scene(self, image_name, rows):
+        """Queue all prediction rows of one scene"""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((image_name, rows))
+        self.completed_scenes.add(image_name)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+class VisualizationWriter:
+    """Draws predictions and encodes/writes the images from a small thread pool.
+
+    cv2 drawing and encoding release the GIL, so rendering overlaps with the
+    model instead of sitting on the critical path. At most max_pending
+    images are held in memory at once. image_format is one of IMAGE_FORMATS;
+    quality is the JPEG/WebP quality or the PNG compression level.
+    """
+
+    def __init__(self, output_dir, num_threads=2, max_pending=8, image_format="png", quality=None):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format '{image_format}', expected one of {tuple(IMAGE_FORMATS)}")
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.extension, parameter, default = IMAGE_FORMATS[image_format]
+        self.encode_params = [parameter, default if quality is None else int(quality)]
+        self._pool = ThreadPoolExecutor(max_workers=num_threads)
+        self._slots = threading.Semaphore(max_pending)
+        self._futures = []
+
+    def output_path(self, image_name):
+        return os.path.join(self.output_dir, f"prediction_{os.path.splitext(image_name)[0]}{self.extension}")
+
+    def _render(self, image, image_name, polygons, predicted_labels):
+        try:
+            vis_image = draw_predictions(image, polygons, predicted_labels)
+            ok, encoded = cv2.imencode(self.extension, vis_image, self.encode_params)
+            if not ok:
+                raise RuntimeError(f"Could not encode the visualization of {image_name} as {self.extension}")
+            output_path = self.output_path(image_name)
+            with open(output_path, "wb") as f:
+                f.write(encoded.tobytes())
+            return output_path
+        finally:
+            self._slots.release()
+
+    def submit(self, image, image_name, polygons, predicted_labels):
+        """Render one scene; the image is drawn on in place, pass a copy if it is still needed"""
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._render, image, image_name, polygons, predicted_labels))
+        self._futures = [f for f in self._futures if not f.done() or f.exception() is not None]
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
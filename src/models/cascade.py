@@ -0,0 +1,89 @@
+import os
+import argparse
+
+import torch
+
+from src.models.classifier import ScreeningClassifier, build_from_checkpoint, damage_classes, load_model
+
+NO_DAMAGE = damage_classes["no-damage"]
+
+class CascadeClassifier:
+    """Two-stage classifier with an early exit for obvious no-damage buildings.
+
+    Every crop goes through the cheap first stage. Crops it scores as
+    no-damage with probability >= threshold keep that answer; all others are
+    escalated to the second stage (ImprovedDamageClassifier). Returns log
+    probabilities, so torch.softmax of the output gives the final class scores
+    as for any other model passed to predict_damage_batch.
+    """
+
+    def __init__(self, first_stage, second_stage, threshold=0.9):
+        self.first_stage = first_stage
+        self.second_stage = second_stage
+        self.threshold = threshold
+        self.seen = 0
+        self.escalated = 0
+
+    def __call__(self, x):
+        scores = torch.softmax(self.first_stage(x).float(), dim=1)
+        escalate = scores[:, NO_DAMAGE] < self.threshold
+        if escalate.any():
+            scores[escalate] = torch.softmax(self.second_stage(x[escalate]).float(), dim=1)
+
+        self.seen += len(x)
+        self.escalated += int(escalate.sum())
+        return scores.clamp_min(1e-12).log()
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.seen if self.seen else 0.0
+
+    def reset_stats(self):
+        self.seen, self.escalated = 0, 0
+
+    def eval(self):
+        self.first_stage.eval()
+        self.second_stage.eval()
+        return self
+
+def load_screening_model(checkpoint_path, device, input_size=112):
+    model = build_from_checkpoint(ScreeningClassifier, checkpoint_path, device,
+                                  num_classes=len(damage_classes), input_size=input_size)
+    return model.eval()
+
+def load_cascade(screening_path, checkpoint_path, threshold=0.9, variant="eager", input_size=112,
+                 architecture="resnet50"):
+    """Cascade of the screening model and load_model(checkpoint_path, variant, architecture), on the second stage's device"""
+    second_stage, device = load_model(checkpoint_path, variant=variant, architecture=architecture)
+    first_stage = load_screening_model(screening_path, device, input_size)
+    return CascadeClassifier(first_stage, second_stage, threshold).eval(), device
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the first-stage screening model of the cascade")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--output", default="checkpoints/screening_model.pth")
+    parser.add_argument("--state", default="checkpoints/screening_train_state.pth")
+    parser.add_argument("--restart", action="store_true")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing --output file")
+    parser.add_argument("--input-size", type=int, default=112)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--trainable-blocks", type=int, default=4)
+    parser.add_argument("--bf16", action="store_true")
+    args = parser.parse_args()
+
+    # Training-only imports, so serving a cascade does not load the training stack
+    from src.models.train import train
+    from src.preprocessing.dataset import DisasterDataset
+
+    dataset = DisasterDataset(image_dir=args.images, json_dir=args.labels, crop_store_dir=args.crop_store)
+    train(dataset, args.output, args.state, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+          num_workers=args.num_workers, trainable_blocks=args.trainable_blocks, bf16=args.bf16,
+          resume=not args.restart, model=ScreeningClassifier(input_size=args.input_size), overwrite=args.overwrite)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torchvision.models import (resnet18, resnet50, mobilenet_v3_large, mobilenet_v3_small, ResNet18_Weights,
+                                ResNet50_Weights, MobileNet_V3_Large_Weights, MobileNet_V3_Small_Weights)
+
+# Define damage classes
+damage_classes = {
+    "no-damage": 0,
+    "minor-damage": 1,
+    "major-damage": 2,
+    "destroyed": 3
+}
+
+class ImprovedDamageClassifier(nn.Module):
+    def __init__(self, num_classes=4, dropout_prob=0.5, pretrained=True):
+        super(ImprovedDamageClassifier, self).__init__()
+        # ImageNet weights are only needed to start training; load_model builds with pretrained=False
+        self.resnet = resnet50(weights=ResNet50_Weights.IMAGENET1K_V1 if pretrained else None)
+        self.resnet = nn.Sequential(*list(self.resnet.children())[:-1])
+        
+        self.fc1 = nn.Linear(2048, 1024)
+        self.bn1 = nn.BatchNorm1d(1024)
+        self.fc2 = nn.Linear(1024, 512)
+        self.bn2 = nn.BatchNorm1d(512)
+        self.fc3 = nn.Linear(512, num_classes)
+        self.dropout = nn.Dropout(dropout_prob)
+
+    def forward(self, x):
+        return self.forward_head(self.extract_features(x))
+
+    def extract_features(self, x):
+        """Pooled 2048-d ResNet-50 features"""
+        x = self.resnet(x)
+        return x.view(x.size(0), -1)
+
+    def forward_head(self, x):
+        """Classification head on pooled features"""
+        x = self.fc1(x)
+        x = self.bn1(x)
+        x = nn.ReLU()(x)
+        x = self.dropout(x)
+        
+        x = self.fc2(x)
+        x = self.bn2(x)
+        x = nn.ReLU()(x)
+        x = self.dropout(x)
+        
+        x = self.fc3(x)
+        return x
+
+class ScreeningClassifier(nn.Module):
+    """ResNet-18 on downsampled crops, the cheap first stage of the cascade in src/models/cascade.py.
+
+    Takes the same (N, 3, 224, 224) batches as ImprovedDamageClassifier and
+    resizes them to input_size before the backbone.
+    """
+
+    def __init__(self, num_classes=4, input_size=112, pretrained=True):
+        super(ScreeningClassifier, self).__init__()
+        self.input_size = input_size
+        self.resnet = resnet18(weights=ResNet18_Weights.IMAGENET1K_V1 if pretrained else None)
+        self.resnet = nn.Sequential(*list(self.resnet.children())[:-1])
+        self.fc = nn.Linear(512, num_classes)
+
+    def forward(self, x):
+        if x.shape[-1] != self.input_size:
+            x = F.interpolate(x, size=(self.input_size, self.input_size), mode="bilinear",
+                              align_corners=False, antialias=True)
+        x = self.resnet(x)
+        return self.fc(x.view(x.size(0), -1))
+
+# Compact trunks for distilled students and the width of their pooled features
+STUDENT_BACKBONES = {
+    "resnet18": 512,
+    "mobilenet_v3_large": 960,
+    "mobilenet_v3_small": 576
+}
+
+class StudentClassifier(nn.Module):
+    """Compact trunk with the same classification head as ImprovedDamageClassifier.
+
+    Trained from the teacher's soft labels by src/models/distill.py.
+    """
+
+    def __init__(self, backbone="resnet18", num_classes=4, dropout_prob=0.5, pretrained=True):
+        super(StudentClassifier, self).__init__()
+        if backbone not in STUDENT_BACKBONES:
+            raise ValueError(f"Unknown student backbone '{backbone}', expected one of {tuple(STUDENT_BACKBONES)}")
+
+        if backbone == "resnet18":
+            trunk = resnet18(weights=ResNet18_Weights.IMAGENET1K_V1 if pretrained else None)
+            self.backbone = nn.Sequential(*list(trunk.children())[:-1])
+        elif backbone == "mobilenet_v3_large":
+            trunk = mobilenet_v3_large(weights=MobileNet_V3_Large_Weights.IMAGENET1K_V1 if pretrained else None)
+            self.backbone = nn.Sequential(trunk.features, trunk.avgpool)
+        else:
+            trunk = mobilenet_v3_small(weights=MobileNet_V3_Small_Weights.IMAGENET1K_V1 if pretrained else None)
+            self.backbone = nn.Sequential(trunk.features, trunk.avgpool)
+
+        self.fc1 = nn.Linear(STUDENT_BACKBONES[backbone], 1024)
+        self.bn1 = nn.BatchNorm1d(1024)
+        self.fc2 = nn.Linear(1024, 512)
+        self.bn2 = nn.BatchNorm1d(512)
+        self.fc3 = nn.Linear(512, num_classes)
+        self.dropout = nn.Dropout(dropout_prob)
+
+    def forward(self, x):
+        return self.forward_head(self.extract_features(x))
+
+    def extract_features(self, x):
+        x = self.backbone(x)
+        return x.view(x.size(0), -1)
+
+    forward_head = ImprovedDamageClassifier.forward_head
+
+# Architectures selectable from load_model: the ResNet-50 teacher or a student backbone
+ARCHITECTURES = ("resnet50",) + tuple(STUDENT_BACKBONES)
+
+# Inference variants selectable from load_model. Everything except "eager"
+# runs on CPU; "torchscript", "static_int8" and "onnx" expect a file written
+# by src/models/export.py instead of the state_dict checkpoint.
+MODEL_VARIANTS = ("eager", "dynamic_int8", "torchscript", "static_int8", "onnx")
+
+class OnnxClassifier:
+    """Runs an exported ONNX classifier with onnxruntime behind the nn.Module call interface"""
+
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        outputs = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})
+        return torch.from_numpy(outputs[0])
+
+    def eval(self):
+        return self
+
+def load_state_dict(checkpoint_path):
+    """Memory-map a state_dict checkpoint on CPU instead of reading it all into memory.
+
+    Falls back to a regular read for checkpoints in the legacy (pre zip)
+    serialization format, which cannot be memory-mapped.
+    """
+    try:
+        return torch.load(checkpoint_path, map_location="cpu", mmap=True, weights_only=True)
+    except RuntimeError:
+        return torch.load(checkpoint_path, map_location="cpu", weights_only=True)
+
+def build_from_checkpoint(model_class, checkpoint_path, device, **kwargs):
+    """Build model_class from a checkpoint without downloading or initialising weights.
+
+    The module is created on the meta device (no allocation, no random init,
+    no ImageNet download) and the memory-mapped checkpoint tensors are
+    assigned to it directly, so startup works offline and costs little more
+    than mapping the file.
+    """
+    with torch.device("meta"):
+        model = model_class(pretrained=False, **kwargs)
+    model.load_state_dict(load_state_dict(checkpoint_path), assign=True)
+    return model.to(device)
+
+def load_model(checkpoint_path, variant="eager", architecture="resnet50"):
+    """Load a classifier for inference.
+
+    architecture selects the ResNet-50 ImprovedDamageClassifier or a distilled
+    StudentClassifier backbone; it only matters for the state_dict variants
+    (eager, dynamic_int8), exported files already contain their architecture.
+
+    Returns:
+        tuple: (model in eval mode, device)
+    """
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}', expected one of {MODEL_VARIANTS}")
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture '{architecture}', expected one of {ARCHITECTURES}")
+
+    if variant == "eager":
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    else:
+        device = torch.device("cpu")
+
+    if variant in ("torchscript", "static_int8"):
+        model = torch.jit.load(checkpoint_path, map_location=device)
+    elif variant == "onnx":
+        model = OnnxClassifier(checkpoint_path)
+    else:
+        if architecture == "resnet50":
+            model = build_from_checkpoint(ImprovedDamageClassifier, checkpoint_path, device, num_classes=4)
+        else:
+            model = build_from_checkpoint(StudentClassifier, checkpoint_path, device, backbone=architecture)
+        if variant == "dynamic_int8":
+            # Only the fully connected head has dynamic int8 kernels
+            model.eval()
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    model.eval()
+    return model, device
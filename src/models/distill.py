@@ -0,0 +1,118 @@
+import os
+import argparse
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import Dataset
+
+from src.models.classifier import StudentClassifier, STUDENT_BACKBONES, load_model
+from src.models.feature_cache import build_feature_cache, feature_transform, head_logits
+from src.models.train import train
+from src.preprocessing.dataset import DisasterDataset
+from src.utils.hashing import file_sha1
+
+class SoftLabelDataset(Dataset):
+    """DisasterDataset samples with the teacher's logits appended.
+
+    Samples whose UID has no teacher logits are dropped. Scene grouping and
+    decode statistics are forwarded to the wrapped dataset so the training
+    loop and SceneGroupedBatchSampler work unchanged.
+    """
+
+    def __init__(self, dataset, teacher_logits):
+        self.dataset = dataset
+        self.indices = [i for i, sample in enumerate(dataset.samples) if sample[3] in teacher_logits]
+        self.teacher_logits = np.stack([teacher_logits[dataset.samples[i][3]] for i in self.indices]).astype(np.float32)
+        self.scene_cache = dataset.scene_cache
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        sample = self.dataset[self.indices[idx]]
+        if sample is None:
+            return None
+        return tuple(sample) + (torch.from_numpy(self.teacher_logits[idx]),)
+
+    def scene_keys(self):
+        keys = self.dataset.scene_keys()
+        return [keys[i] for i in self.indices]
+
+    def decode_stats(self):
+        return self.dataset.decode_stats()
+
+class DistillationLoss(nn.Module):
+    """alpha * T^2 * KL(teacher || student) on temperature-softened logits + (1 - alpha) * cross entropy"""
+
+    def __init__(self, temperature=4.0, alpha=0.7, label_smoothing=0.1):
+        super(DistillationLoss, self).__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+        self.label_smoothing = label_smoothing
+
+    def forward(self, student_logits, labels, teacher_logits):
+        teacher_logits = teacher_logits.to(student_logits.device)
+        soft = F.kl_div(F.log_softmax(student_logits / self.temperature, dim=1),
+                        F.log_softmax(teacher_logits / self.temperature, dim=1),
+                        reduction="batchmean", log_target=True) * self.temperature ** 2
+        hard = F.cross_entropy(student_logits, labels, label_smoothing=self.label_smoothing)
+        return self.alpha * soft + (1 - self.alpha) * hard
+
+def teacher_soft_labels(teacher, device, dataset, cache_dir, checkpoint_sha1, batch_size=128, num_workers=4):
+    """Teacher logits per building UID, computed from (and added to) the feature cache.
+
+    Returns:
+        dict: uid -> (num_classes,) float32 logits on un-augmented crops
+    """
+    transform = dataset.transform
+    dataset.transform = feature_transform  # the cache holds features of un-augmented crops
+    try:
+        cache = build_feature_cache(teacher, device, dataset, cache_dir, checkpoint_sha1,
+                                    batch_size=batch_size, num_workers=num_workers)
+    finally:
+        dataset.transform = transform
+
+    logits = head_logits(teacher, device, cache, np.arange(len(cache))).numpy()
+    return dict(zip(cache.index['uid'], logits))
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill ImprovedDamageClassifier into a compact student")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth", help="teacher checkpoint")
+    parser.add_argument("--backbone", choices=list(STUDENT_BACKBONES), default="resnet18")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--cache-dir", default=os.path.join(os.getcwd(), "data/processed/features"))
+    parser.add_argument("--output", default=None, help="defaults to checkpoints/student_<backbone>.pth")
+    parser.add_argument("--state", default=None)
+    parser.add_argument("--restart", action="store_true")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing --output file")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="weight of the soft-label term")
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--bf16", action="store_true")
+    args = parser.parse_args()
+
+    output = args.output or f"checkpoints/student_{args.backbone}.pth"
+    state = args.state or f"checkpoints/student_{args.backbone}_train_state.pth"
+
+    dataset = DisasterDataset(image_dir=args.images, json_dir=args.labels, crop_store_dir=args.crop_store)
+    teacher, device = load_model(args.checkpoint)
+    teacher_logits = teacher_soft_labels(teacher, device, dataset, args.cache_dir, file_sha1(args.checkpoint),
+                                         batch_size=args.batch_size, num_workers=args.num_workers)
+    del teacher
+
+    soft_dataset = SoftLabelDataset(dataset, teacher_logits)
+    print(f"Distilling into {args.backbone} on {len(soft_dataset)} buildings with teacher soft labels")
+    train(soft_dataset, output, state, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+          num_workers=args.num_workers, trainable_blocks=None, bf16=args.bf16, resume=not args.restart,
+          model=StudentClassifier(backbone=args.backbone),
+          criterion=DistillationLoss(temperature=args.temperature, alpha=args.alpha), overwrite=args.overwrite)
+
+if __name__ == "__main__":
+    main()
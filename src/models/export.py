@@ -0,0 +1,105 @@
+import os
+import copy
+import json
+import argparse
+
+import cv2
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from src.models.classifier import load_model
+from src.models.inference import crop_buildings, preprocess_batch
+
+EXAMPLE_INPUT_SHAPE = (1, 3, 224, 224)
+
+def export_torchscript(model, output_path):
+    """Trace and freeze the classifier for CPU inference"""
+    model = model.cpu().eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(*EXAMPLE_INPUT_SHAPE))
+        traced = torch.jit.freeze(traced)
+    traced.save(output_path)
+    return output_path
+
+def export_onnx(model, output_path, opset_version=17):
+    """Export the classifier to ONNX with a dynamic batch dimension"""
+    model = model.cpu().eval()
+    torch.onnx.export(
+        model, torch.randn(*EXAMPLE_INPUT_SHAPE), output_path,
+        input_names=["image"], output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset_version
+    )
+    return output_path
+
+def calibration_batches(json_dir, image_dir, num_images=10, batch_size=32):
+    """Yield preprocessed building crops from a few scenes to calibrate static quantization"""
+    crops = []
+    json_files = sorted(f for f in os.listdir(json_dir) if f.endswith(".json") and 'post' in f)
+    for json_file in json_files[:num_images]:
+        with open(os.path.join(json_dir, json_file), "r") as f:
+            data = json.load(f)
+        image = cv2.imread(os.path.join(image_dir, data.get("metadata", {}).get("img_name", "")))
+        if image is None:
+            continue
+        crops.extend(building['crop'] for building in crop_buildings(image, data))
+
+    for start in range(0, len(crops), batch_size):
+        yield preprocess_batch(crops[start:start + batch_size])
+
+def quantize_static(model, batches, backend="x86"):
+    """Static int8 ResNet-50 trunk (FX graph mode) plus a dynamic int8 FC head.
+
+    The trunk is calibrated on the given batches of preprocessed crops. The
+    head is quantized dynamically because its forward creates ReLU modules on
+    the fly, which FX cannot trace.
+    """
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+
+    prepared = prepare_fx(model.resnet, get_default_qconfig_mapping(backend),
+                          example_inputs=(torch.randn(*EXAMPLE_INPUT_SHAPE),))
+    with torch.no_grad():
+        for batch in batches:
+            prepared(batch)
+    model.resnet = convert_fx(prepared)
+
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def export_static_int8(model, batches, output_path, backend="x86"):
+    """Quantize with quantize_static and save as TorchScript"""
+    quantized = quantize_static(model, batches, backend=backend)
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, torch.randn(*EXAMPLE_INPUT_SHAPE))
+    traced.save(output_path)
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Export ImprovedDamageClassifier for CPU inference")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--format", choices=["torchscript", "onnx", "static_int8"], default="torchscript")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--calib-labels", default=os.path.join(os.getcwd(), "data/raw/sample/labels"))
+    parser.add_argument("--calib-images", default=os.path.join(os.getcwd(), "data/raw/sample/images"))
+    parser.add_argument("--calib-scenes", type=int, default=10)
+    args = parser.parse_args()
+
+    extension = "onnx" if args.format == "onnx" else "pt"
+    output_path = args.output or os.path.join(
+        os.path.dirname(args.checkpoint), f"improved_model_{args.format}.{extension}")
+
+    model, _ = load_model(args.checkpoint)
+    if args.format == "torchscript":
+        export_torchscript(model, output_path)
+    elif args.format == "onnx":
+        export_onnx(model, output_path)
+    else:
+        batches = calibration_batches(args.calib_labels, args.calib_images, num_images=args.calib_scenes)
+        export_static_int8(model, batches, output_path)
+
+    print(f"Exported {args.format} model to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader, Subset
+from sklearn.metrics import f1_score
+
+from src.models.classifier import load_model
+from src.preprocessing.dataset import DisasterDataset
+from src.utils.hashing import file_sha1
+
+FEATURE_DIM = 2048
+
+# Deterministic transform for DisasterDataset tensors (already RGB in [0, 1])
+feature_transform = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+
+class FeatureCache:
+    """Pooled ResNet-50 features stored once per building UID.
+
+    features.npy is a float16 (N, 2048) array opened with mmap_mode='r';
+    index.csv holds uid, image_name and label for each row and meta.json
+    the sha1 of the checkpoint whose trunk produced the features.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index = pd.read_csv(os.path.join(cache_dir, 'index.csv'))
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.features = np.load(os.path.join(cache_dir, 'features.npy'), mmap_mode='r')
+        self.labels = self.index['label'].to_numpy()
+        self._rows = {uid: row for row, uid in enumerate(self.index['uid'])}
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows_for(self, uids):
+        """Cache rows of the given UIDs (unknown UIDs are dropped)"""
+        return np.array([self._rows[uid] for uid in uids if uid in self._rows], dtype=np.int64)
+
+    @staticmethod
+    def exists(cache_dir):
+        return all(os.path.exists(os.path.join(cache_dir, name))
+                   for name in ('features.npy', 'index.csv', 'meta.json'))
+
+def _collate(batch):
+    batch = [sample for sample in batch if sample is not None]
+    if not batch:
+        return torch.empty(0, 3, 224, 224), torch.empty(0, dtype=torch.long), [], []
+    images, labels, image_names, uids = zip(*batch)
+    return torch.stack(images), torch.tensor(labels), list(image_names), list(uids)
+
+def build_feature_cache(model, device, dataset, cache_dir, checkpoint_sha1, batch_size=128, num_workers=0):
+    """Run the trunk over every dataset sample whose UID is not cached yet.
+
+    Rows already cached for the same checkpoint are kept; a cache written by
+    another checkpoint is rebuilt from scratch.
+
+    Returns:
+        FeatureCache: The up-to-date cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    old = FeatureCache(cache_dir) if FeatureCache.exists(cache_dir) else None
+    if old is not None and old.meta.get('checkpoint_sha1') != checkpoint_sha1:
+        print("Checkpoint changed, rebuilding the feature cache")
+        old = None
+
+    uids = [sample[3] for sample in dataset.samples]
+    known = set(old.index['uid']) if old is not None else set()
+    missing = [i for i, uid in enumerate(uids) if uid not in known]
+    if not missing:
+        print(f"Feature cache up to date: {len(old)} buildings")
+        return old
+
+    num_old = len(old) if old is not None else 0
+    tmp_path = os.path.join(cache_dir, 'features.tmp.npy')
+    features = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16,
+                                         shape=(num_old + len(missing), FEATURE_DIM))
+    rows = []
+    if old is not None:
+        features[:num_old] = old.features
+        rows = old.index.to_dict('records')
+
+    loader = DataLoader(Subset(dataset, missing), batch_size=batch_size, shuffle=False,
+                        num_workers=num_workers, collate_fn=_collate)
+    offset = num_old
+    model.eval()
+    with torch.inference_mode():
+        for images, labels, image_names, batch_uids in loader:
+            if len(labels) == 0:
+                continue
+            batch_features = model.extract_features(images.to(device)).float().cpu().numpy()
+            features[offset:offset + len(batch_features)] = batch_features.astype(np.float16)
+            offset += len(batch_features)
+            rows.extend({'uid': uid, 'image_name': name, 'label': int(label)}
+                        for uid, name, label in zip(batch_uids, image_names, labels))
+            print(f"Extracted features for {offset - num_old}/{len(missing)} buildings")
+
+    features.flush()
+    if offset < len(features):
+        # Some crops could not be read, drop the unused tail
+        np.save(os.path.join(cache_dir, 'features.npy'), features[:offset])
+        del features, old
+        os.remove(tmp_path)
+    else:
+        del features, old
+        os.replace(tmp_path, os.path.join(cache_dir, 'features.npy'))
+    pd.DataFrame(rows, columns=['uid', 'image_name', 'label']).to_csv(os.path.join(cache_dir, 'index.csv'), index=False)
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump({'checkpoint_sha1': checkpoint_sha1, 'feature_dim': FEATURE_DIM, 'num_features': len(rows)}, f, indent=4)
+
+    return FeatureCache(cache_dir)
+
+def _feature_batches(cache, rows, batch_size, shuffle=False):
+    rows = np.random.permutation(rows) if shuffle else np.asarray(rows)
+    for start in range(0, len(rows), batch_size):
+        batch_rows = np.sort(rows[start:start + batch_size])  # sorted reads on the memmap
+        features = torch.from_numpy(cache.features[batch_rows].astype(np.float32))
+        yield features, torch.from_numpy(cache.labels[batch_rows])
+
+def head_logits(model, device, cache, rows, batch_size=1024):
+    """Head logits for the given cache rows, in row order"""
+    model.eval()
+    rows = np.asarray(rows)
+    logits = []
+    with torch.inference_mode():
+        for start in range(0, len(rows), batch_size):
+            batch_rows = rows[start:start + batch_size]
+            features = torch.from_numpy(cache.features[batch_rows].astype(np.float32)).to(device)
+            logits.append(model.forward_head(features).float().cpu())
+    return torch.cat(logits) if logits else torch.empty(0, model.fc3.out_features)
+
+def train_head(model, device, cache, train_rows, val_rows=None, epochs=10, lr=1e-3, batch_size=256):
+    """Train fc1/fc2/fc3 (and their batch norms) straight off the feature cache"""
+    head_params = [p for name, p in model.named_parameters() if not name.startswith('resnet.')]
+    optimizer = torch.optim.Adam(head_params, lr=lr)
+    criterion = nn.CrossEntropyLoss(label_smoothing=0.1)
+
+    for epoch in range(epochs):
+        model.train()
+        total_loss, num_batches = 0.0, 0
+        for features, labels in _feature_batches(cache, train_rows, batch_size, shuffle=True):
+            if len(labels) < 2:
+                continue  # BatchNorm1d needs more than one sample in train mode
+            optimizer.zero_grad()
+            loss = criterion(model.forward_head(features.to(device)), labels.to(device))
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+            num_batches += 1
+
+        message = f"Epoch {epoch+1}/{epochs} - Loss: {total_loss / max(num_batches, 1):.4f}"
+        if val_rows is not None and len(val_rows):
+            predicted = head_logits(model, device, cache, val_rows).argmax(dim=1).numpy()
+            message += f", Val F1: {f1_score(cache.labels[val_rows], predicted, average='macro'):.4f}"
+        print(message)
+    return model
+
+def fit_temperature(logits, labels, max_iter=50):
+    """Temperature-scaling calibration: the T minimising NLL of logits / T"""
+    log_t = torch.zeros(1, requires_grad=True)
+    labels = torch.as_tensor(labels)
+    optimizer = torch.optim.LBFGS([log_t], lr=0.1, max_iter=max_iter)
+    criterion = nn.CrossEntropyLoss()
+
+    def closure():
+        optimizer.zero_grad()
+        loss = criterion(logits / log_t.exp(), labels)
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    return log_t.exp().item()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a feature cache and train/evaluate the head from it")
+    parser.add_argument("command", choices=["build", "train-head", "evaluate"])
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--cache-dir", default=os.path.join(os.getcwd(), "data/processed/features"))
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--output", default="checkpoints/improved_model_head.pth")
+    args = parser.parse_args()
+
+    model, device = load_model(args.checkpoint)
+
+    if args.command == "build":
+        dataset = DisasterDataset(transform=feature_transform, image_dir=args.images, json_dir=args.labels,
+                                  crop_store_dir=args.crop_store)
+        build_feature_cache(model, device, dataset, args.cache_dir, file_sha1(args.checkpoint),
+                            batch_size=args.batch_size, num_workers=args.num_workers)
+        return
+
+    cache = FeatureCache(args.cache_dir)
+    if cache.meta.get('checkpoint_sha1') != file_sha1(args.checkpoint):
+        print("Warning: the feature cache was built from a different checkpoint")
+
+    rows = np.random.RandomState(0).permutation(len(cache))
+    num_val = int(len(rows) * args.val_fraction)
+    val_rows, train_rows = np.sort(rows[:num_val]), rows[num_val:]
+
+    if args.command == "train-head":
+        train_head(model, device, cache, train_rows, val_rows, epochs=args.epochs, lr=args.lr)
+        torch.save(model.state_dict(), args.output)
+        print(f"Model with retrained head saved to {args.output}")
+
+    logits = head_logits(model, device, cache, val_rows)
+    predicted = logits.argmax(dim=1).numpy()
+    print(f"Validation macro F1: {f1_score(cache.labels[val_rows], predicted, average='macro'):.4f}")
+    print(f"Calibrated temperature: {fit_temperature(logits, cache.labels[val_rows]):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+import torch
+from torchvision.ops import roi_align
+
+from src.models.classifier import damage_classes, load_model
+from src.models.inference import crop_buildings, preprocess_scene, predict_damage_batch
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.evaluation.reports import save_accumulated_metrics
+
+class SceneROIClassifier:
+    """Classifies every building of a scene from one backbone pass over the full image.
+
+    The ResNet-50 trunk (everything before global average pooling) runs once
+    on the whole scene. Each building's pixel bounding box is ROI-aligned on
+    the stride-32 feature map, average pooled to the 2048-d vector the head
+    expects, and classified by forward_head. Cost depends on the image size,
+    not on the number of buildings.
+
+    The head was trained on features of resized crops, so check agreement
+    with crop mode (``--compare-crops``) before relying on a checkpoint here.
+    """
+
+    def __init__(self, model, output_size=7, sampling_ratio=2, box_padding=0):
+        if not hasattr(model, "resnet") or not hasattr(model, "forward_head"):
+            raise ValueError("scene mode needs an eager ImprovedDamageClassifier (variant 'eager' or 'dynamic_int8')")
+        self.model = model
+        self.trunk = model.resnet[:-1]
+        self.output_size = output_size
+        self.sampling_ratio = sampling_ratio
+        self.box_padding = box_padding
+
+    def __call__(self, scene, boxes):
+        """Logits for (N, 4) x1, y1, x2, y2 pixel boxes on a (1, 3, H, W) scene"""
+        features = self.trunk(scene)
+        if self.box_padding:
+            boxes = boxes + boxes.new_tensor([-1, -1, 1, 1]) * self.box_padding
+        pooled = roi_align(features, [boxes], output_size=self.output_size,
+                           spatial_scale=features.shape[-1] / scene.shape[-1],
+                           sampling_ratio=self.sampling_ratio, aligned=True)
+        return self.model.forward_head(pooled.mean(dim=(2, 3)))
+
+    def eval(self):
+        self.model.eval()
+        return self
+
+def building_boxes(buildings):
+    """(N, 4) float32 pixel boxes of crop_buildings output, matching the crop bounds"""
+    boxes = np.empty((len(buildings), 4), dtype=np.float32)
+    for i, building in enumerate(buildings):
+        x_min, y_min = building['polygon'].min(axis=0).astype(int)
+        boxes[i] = (x_min, y_min, x_min + building['crop'].shape[1], y_min + building['crop'].shape[0])
+    return torch.from_numpy(boxes)
+
+def predict_scene(classifier, device, image, data):
+    """Classify the labelled buildings of one scene with a single backbone pass.
+
+    Returns:
+        tuple: (buildings, class_ids, scores) with buildings as returned by crop_buildings
+    """
+    buildings = crop_buildings(image, data)
+    if not buildings:
+        return buildings, np.empty(0, dtype=np.int64), np.empty((0, len(damage_classes)), dtype=np.float32)
+
+    with torch.inference_mode():
+        outputs = classifier(preprocess_scene(image).to(device), building_boxes(buildings).to(device))
+        scores = torch.softmax(outputs, dim=1).float().cpu().numpy()
+    return buildings, scores.argmax(axis=1), scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene-level inference with ROI-aligned building features")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=["eager", "dynamic_int8"], default="eager")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/sample/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/sample/images"))
+    parser.add_argument("--output", default="output/scene_inference")
+    parser.add_argument("--num-images", type=int, default=None)
+    parser.add_argument("--compare-crops", action="store_true", help="also run crop mode and report agreement")
+    args = parser.parse_args()
+
+    model, device = load_model(args.checkpoint, variant=args.variant)
+    classifier = SceneROIClassifier(model).eval()
+    metrics, crop_metrics = ConfusionMatrixAccumulator(), ConfusionMatrixAccumulator()
+    scene_time, crop_time, num_buildings, num_agree = 0.0, 0.0, 0, 0
+
+    json_files = sorted(f for f in os.listdir(args.labels) if f.endswith(".json") and 'post' in f)
+    for json_file in json_files[:args.num_images]:
+        with open(os.path.join(args.labels, json_file), "r") as f:
+            data = json.load(f)
+        image = cv2.imread(os.path.join(args.images, data["metadata"]["img_name"]))
+        if image is None:
+            continue
+
+        start = time.perf_counter()
+        buildings, class_ids, _ = predict_scene(classifier, device, image, data)
+        scene_time += time.perf_counter() - start
+        true_labels = [damage_classes[b['true_label']] for b in buildings]
+        metrics.update(true_labels, class_ids)
+        num_buildings += len(buildings)
+
+        if args.compare_crops:
+            start = time.perf_counter()
+            crop_ids, _ = predict_damage_batch(model, device, [b['crop'] for b in buildings])
+            crop_time += time.perf_counter() - start
+            crop_metrics.update(true_labels, crop_ids)
+            num_agree += int((crop_ids == class_ids).sum())
+
+    os.makedirs(args.output, exist_ok=True)
+    print(save_accumulated_metrics(metrics, args.output))
+    print(f"\nScene mode: {num_buildings} buildings, {num_buildings / max(scene_time, 1e-9):.1f} buildings/s, "
+          f"macro-F1 {metrics.f1('macro'):.4f}")
+    if args.compare_crops:
+        print(f"Crop mode:  {num_buildings / max(crop_time, 1e-9):.1f} buildings/s, macro-F1 {crop_metrics.f1('macro'):.4f}, "
+              f"agreement {num_agree / max(num_buildings, 1):.2%}")
+
+if __name__ == "__main__":
+    main()
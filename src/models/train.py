@@ -0,0 +1,241 @@
+import os
+import time
+import argparse
+
+import torch
+import torch.nn as nn
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader, Subset, default_collate
+
+from src.models.classifier import ImprovedDamageClassifier
+from src.preprocessing.dataset import DisasterDataset, SceneGroupedBatchSampler
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+
+# Same augmentation as notebooks/02_Train_RESNET_50.ipynb; inputs are float RGB tensors in [0, 1]
+train_transform = transforms.Compose([
+    transforms.ToPILImage(),
+    transforms.RandomResizedCrop(224, scale=(0.8, 1.0)),
+    transforms.RandomHorizontalFlip(),
+    transforms.RandomRotation(20),
+    transforms.ColorJitter(brightness=0.3, contrast=0.3, saturation=0.2),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+eval_transform = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+
+class TransformSubset(Subset):
+    """Subset that applies its own transform, so train and validation splits can augment differently"""
+
+    def __init__(self, dataset, indices, transform=None):
+        super().__init__(dataset, indices)
+        self.transform = transform
+
+    def __getitem__(self, idx):
+        sample = self.dataset[self.indices[idx]]
+        if sample is None or self.transform is None:
+            return sample
+        return (self.transform(sample[0]),) + tuple(sample[1:])
+
+def collate_skip_none(batch):
+    """Collate that drops samples whose scene could not be read or cropped"""
+    batch = [sample for sample in batch if sample is not None]
+    return default_collate(batch) if batch else None
+
+def make_loader(dataset, batch_sampler, num_workers, prefetch_factor, device):
+    """DataLoader with workers kept alive across epochs and pinned memory for GPU copies"""
+    return DataLoader(dataset, batch_sampler=batch_sampler, num_workers=num_workers,
+                      persistent_workers=num_workers > 0,
+                      prefetch_factor=prefetch_factor if num_workers > 0 else None,
+                      pin_memory=device.type == "cuda", collate_fn=collate_skip_none)
+
+def split_dataset(dataset, val_fraction=0.2, seed=0):
+    """Deterministic train/validation index split, reproducible when resuming"""
+    order = torch.randperm(len(dataset), generator=torch.Generator().manual_seed(seed)).tolist()
+    num_val = int(len(order) * val_fraction)
+    return TransformSubset(dataset, order[num_val:], train_transform), TransformSubset(dataset, order[:num_val], eval_transform)
+
+def freeze_backbone(model, trainable_blocks=3):
+    """Freeze the ResNet backbone except its last trainable_blocks children"""
+    for param in model.resnet.parameters():
+        param.requires_grad = False
+    if trainable_blocks > 0:
+        for layer in list(model.resnet.children())[-trainable_blocks:]:
+            for param in layer.parameters():
+                param.requires_grad = True
+
+def save_checkpoint(path, model, optimizer, scheduler, epoch, best_f1, config):
+    """Write the full training state atomically so an interrupted save never corrupts a resume"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({
+        'epoch': epoch,
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scheduler': scheduler.state_dict(),
+        'best_f1': best_f1,
+        'config': config
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+def run_epoch(model, device, loader, criterion, optimizer=None, accumulation_steps=1, bf16=False, log_every=10):
+    """One pass over loader; trains when an optimizer is given, otherwise evaluates.
+
+    Batch elements after (images, labels, image_names, uids), such as teacher
+    logits, are passed on to the criterion after the labels.
+
+    Returns:
+        tuple: (average loss, ConfusionMatrixAccumulator, samples/sec)
+    """
+    training = optimizer is not None
+    model.train(training)
+    metrics = ConfusionMatrixAccumulator()
+    total_loss, num_batches, num_samples = 0.0, 0, 0
+    start = time.perf_counter()
+
+    if training:
+        optimizer.zero_grad()
+    with torch.set_grad_enabled(training):
+        for batch_idx, batch in enumerate(loader):
+            if batch is None:
+                continue
+            images, labels = batch[0], batch[1]
+            if training and len(labels) < 2:
+                continue  # BatchNorm1d needs more than one sample in train mode
+            images = images.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
+
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16):
+                outputs = model(images)
+                loss = criterion(outputs.float(), labels, *batch[4:])
+
+            if training:
+                (loss / accumulation_steps).backward()
+                if (batch_idx + 1) % accumulation_steps == 0 or batch_idx + 1 == len(loader):
+                    optimizer.step()
+                    optimizer.zero_grad()
+
+            total_loss += loss.item()
+            num_batches += 1
+            num_samples += len(labels)
+            metrics.update(labels.cpu().numpy(), outputs.argmax(dim=1).cpu().numpy())
+
+            if log_every and ((batch_idx + 1) % log_every == 0 or batch_idx == 0):
+                phase = "Batch" if training else "Validation Batch"
+                print(f"{phase} {batch_idx+1}/{len(loader)} - Loss: {loss.item():.4f}, F1: {metrics.f1('macro'):.4f}")
+
+    elapsed = time.perf_counter() - start
+    return total_loss / max(num_batches, 1), metrics, num_samples / elapsed if elapsed > 0 else 0.0
+
+def train(dataset, output_path, state_path, epochs=50, batch_size=100, accumulation_steps=1, lr=1e-4,
+          step_size=3, gamma=0.5, val_fraction=0.2, num_workers=4, prefetch_factor=4, scenes_per_window=4,
+          trainable_blocks=3, bf16=False, seed=0, resume=True, model=None, criterion=None, overwrite=False):
+    """Train a classifier on a DisasterDataset, resuming from state_path if present.
+
+    model defaults to a new ImprovedDamageClassifier and criterion to label
+    smoothed cross entropy. Only the last trainable_blocks children of
+    model.resnet are trained (None trains every parameter). The full state
+    (model, optimizer, scheduler, epoch) is written to state_path after every
+    epoch; the weights of the best validation macro F1 epoch are saved to
+    output_path as a plain state_dict for load_model. A fresh run (not
+    resumed from state_path) refuses to replace an existing output_path
+    unless overwrite=True, so a first worse epoch never clobbers a
+    production checkpoint.
+    """
+    if not (resume and os.path.exists(state_path)) and os.path.exists(output_path) and not overwrite:
+        raise FileExistsError(f"{output_path} already exists; choose another output path or pass overwrite=True")
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = model if model is not None else ImprovedDamageClassifier(num_classes=4)
+    config = {'model': type(model).__name__, 'batch_size': batch_size, 'accumulation_steps': accumulation_steps,
+              'lr': lr, 'val_fraction': val_fraction, 'trainable_blocks': trainable_blocks, 'seed': seed}
+
+    if trainable_blocks is not None:
+        freeze_backbone(model, trainable_blocks)
+    model.to(device)
+    optimizer = torch.optim.Adam([p for p in model.parameters() if p.requires_grad], lr=lr)
+    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=step_size, gamma=gamma)
+    criterion = criterion if criterion is not None else nn.CrossEntropyLoss(label_smoothing=0.1)
+
+    start_epoch, best_f1 = 0, -1.0
+    if resume and os.path.exists(state_path):
+        state = torch.load(state_path, map_location=device)
+        if state['config'] != config:
+            print(f"Warning: resuming with a different configuration than {state_path} was written with")
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+        scheduler.load_state_dict(state['scheduler'])
+        start_epoch, best_f1 = state['epoch'] + 1, state['best_f1']
+        print(f"Resuming from {state_path} at epoch {start_epoch + 1}/{epochs}")
+
+    train_dataset, val_dataset = split_dataset(dataset, val_fraction, seed)
+    # Whole windows of scenes per worker, so each worker's SceneCache decodes a scene once
+    train_sampler = SceneGroupedBatchSampler.from_dataset(train_dataset, batch_size=batch_size, num_workers=num_workers,
+                                                          scenes_per_window=scenes_per_window, seed=seed)
+    val_sampler = SceneGroupedBatchSampler.from_dataset(val_dataset, batch_size=batch_size, num_workers=num_workers,
+                                                        shuffle=False)
+    train_loader = make_loader(train_dataset, train_sampler, num_workers, prefetch_factor, device)
+    val_loader = make_loader(val_dataset, val_sampler, num_workers, prefetch_factor, device)
+
+    for epoch in range(start_epoch, epochs):
+        print(f"\nEpoch {epoch+1}/{epochs} starting...")
+        train_sampler.set_epoch(epoch)
+        dataset.scene_cache.reset_stats()
+
+        train_loss, train_metrics, train_rate = run_epoch(model, device, train_loader, criterion, optimizer,
+                                                          accumulation_steps=accumulation_steps, bf16=bf16)
+        val_loss, val_metrics, val_rate = run_epoch(model, device, val_loader, criterion, bf16=bf16, log_every=0)
+        scheduler.step()
+
+        val_f1 = val_metrics.f1("macro")
+        decode_stats = dataset.decode_stats()
+        print(f"Epoch {epoch+1} Summary - Train Loss: {train_loss:.4f}, Train F1: {train_metrics.f1('macro'):.4f}, "
+              f"Val Loss: {val_loss:.4f}, Val F1: {val_f1:.4f}")
+        print(f"Throughput - train: {train_rate:.1f} samples/s, val: {val_rate:.1f} samples/s, "
+              f"scene decode hit rate: {decode_stats['hit_rate']:.2%}")
+
+        if val_f1 > best_f1:
+            best_f1 = val_f1
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            torch.save(model.state_dict(), output_path)
+            print(f"New best Val F1, model saved to {output_path}")
+        save_checkpoint(state_path, model, optimizer, scheduler, epoch, best_f1, config)
+
+    print("\nTraining complete!")
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the building damage classifier")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None, help="read crops from src/preprocessing/crop_store.py shards")
+    parser.add_argument("--output", default="checkpoints/improved_model_trained.pth",
+                        help="best weights; kept apart from the shipped checkpoints/improved_model.pth")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing --output file")
+    parser.add_argument("--state", default="checkpoints/train_state.pth", help="resumable training state")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing training state")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--accumulation-steps", type=int, default=1)
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--step-size", type=int, default=3)
+    parser.add_argument("--gamma", type=float, default=0.5)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--prefetch-factor", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=8)
+    parser.add_argument("--scenes-per-window", type=int, default=4)
+    parser.add_argument("--trainable-blocks", type=int, default=3)
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast (CPU or GPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = DisasterDataset(image_dir=args.images, json_dir=args.labels, cache_size=args.cache_size,
+                              crop_store_dir=args.crop_store)
+    train(dataset, args.output, args.state, epochs=args.epochs, batch_size=args.batch_size,
+          accumulation_steps=args.accumulation_steps, lr=args.lr, step_size=args.step_size, gamma=args.gamma,
+          val_fraction=args.val_fraction, num_workers=args.num_workers, prefetch_factor=args.prefetch_factor,
+          scenes_per_window=args.scenes_per_window, trainable_blocks=args.trainable_blocks, bf16=args.bf16,
+          seed=args.seed, resume=not args.restart, overwrite=args.overwrite)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import argparse
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from src.models.inference import crop_buildings, label_buildings, crop_building, resize_crop
+
+CROP_SIZE = 224
+
+def shard_path(store_dir, shard):
+    return os.path.join(store_dir, f"crops_{shard:05d}.npy")
+
+def extract_crops(json_dir, image_dir, store_dir, shard_size=1024, crop_size=CROP_SIZE):
+    """Write every labelled post-disaster building crop to fixed-size uint8 shards.
+
+    Crops are resized to crop_size x crop_size with resize_crop, the same
+    interpolation preprocess_batch uses, and kept in the BGR order returned
+    by cv2.imread. Each shard is a plain .npy file of shape
+    (n, crop_size, crop_size, 3) and index.csv maps every row to its shard,
+    offset, image name, building uid and label.
+
+    Returns:
+        pd.DataFrame: The written index
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    buffer = np.empty((shard_size, crop_size, crop_size, 3), dtype=np.uint8)
+    rows = []
+    shard, offset = 0, 0
+
+    def flush():
+        np.save(shard_path(store_dir, shard), buffer[:offset])
+
+    for json_file in sorted(os.listdir(json_dir)):
+        if not json_file.endswith(".json") or 'post' not in json_file:
+            continue
+
+        with open(os.path.join(json_dir, json_file), "r") as f:
+            data = json.load(f)
+
+        image_name = data.get("metadata", {}).get("img_name")
+        if not image_name:
+            continue
+
+        image = cv2.imread(os.path.join(image_dir, image_name))
+        if image is None:
+            print(f"Could not load image: {image_name}, skipping.")
+            continue
+
+        for building in crop_buildings(image, data):
+            buffer[offset] = resize_crop(building['crop'], crop_size)
+            rows.append({
+                'shard': shard,
+                'offset': offset,
+                'image_name': image_name,
+                'uid': building['building_id'],
+                'label': building['true_label']
+            })
+            offset += 1
+            if offset == shard_size:
+                flush()
+                shard, offset = shard + 1, 0
+
+    if offset > 0:
+        flush()
+
+    index = pd.DataFrame(rows, columns=['shard', 'offset', 'image_name', 'uid', 'label'])
+    index.to_csv(os.path.join(store_dir, 'index.csv'), index=False)
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+        json.dump({'crop_size': crop_size, 'shard_size': shard_size, 'num_crops': len(index)}, f, indent=4)
+
+    print(f"Extracted {len(index)} crops into {shard + (offset > 0)} shards at {store_dir}")
+    return index
+
+class CropStore:
+    """Read-only view over shards written by extract_crops.
+
+    Shards are opened with np.load(mmap_mode='r'), so indexing returns a view
+    into the page cache instead of a decoded copy.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.index = pd.read_csv(os.path.join(store_dir, 'index.csv'))
+        with open(os.path.join(store_dir, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+
+        self._shards = {}
+        self._shard_ids = self.index['shard'].to_numpy()
+        self._offsets = self.index['offset'].to_numpy()
+        self._rows = {
+            (image_name, uid): row
+            for row, (image_name, uid) in enumerate(zip(self.index['image_name'], self.index['uid']))
+        }
+
+    def __len__(self):
+        return len(self.index)
+
+    def _shard(self, shard):
+        # Opened lazily so each DataLoader worker maps the shards itself
+        if shard not in self._shards:
+            self._shards[shard] = np.load(shard_path(self.store_dir, shard), mmap_mode='r')
+        return self._shards[shard]
+
+    def __getitem__(self, row):
+        return self._shard(self._shard_ids[row])[self._offsets[row]]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = {}
+        return state
+
+    def find(self, image_name, uid):
+        """Row of a building in the store, or None if it was not extracted"""
+        return self._rows.get((image_name, uid))
+
+    def get_crop(self, image_name, uid, default=None):
+        row = self.find(image_name, uid)
+        return default if row is None else self[row]
+
+    def scene_buildings(self, image_name, data, image_path, load_image=False):
+        """Buildings of a scene with their crops, decoding the scene only when needed.
+
+        Crops come from the store; the image at image_path is read only when
+        some building was not extracted (those are cropped from it as in
+        crop_buildings) or load_image is set.
+
+        Returns:
+            tuple: (buildings, image). image is None when it was not read;
+            buildings is None when the image was needed but unreadable.
+        """
+        buildings = label_buildings(data)
+        for building in buildings:
+            building['crop'] = self.get_crop(image_name, building['building_id'])
+
+        image = None
+        if load_image or any(b['crop'] is None for b in buildings):
+            image = cv2.imread(image_path)
+            if image is None:
+                return None, None
+
+        scene = []
+        for building in buildings:
+            if building['crop'] is None:
+                building['crop'] = crop_building(image, building['polygon'])
+                if building['crop'].shape[0] == 0 or building['crop'].shape[1] == 0:
+                    continue
+            scene.append(building)
+        return scene, image
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract building crops into memory-mapped shards")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--output", default=os.path.join(os.getcwd(), "data/processed/crops"))
+    parser.add_argument("--shard-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    extract_crops(args.labels, args.images, args.output, shard_size=args.shard_size)
+
+if __name__ == "__main__":
+    main()
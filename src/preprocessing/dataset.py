@@ -0,0 +1,289 @@
+import os
+import random
+import multiprocessing
+from collections import OrderedDict
+
+import cv2
+import torch
+from torch.utils.data import Dataset, Sampler, Subset
+
+from src.models.classifier import damage_classes
+from src.models.inference import resize_crop
+from src.preprocessing.crop_store import CropStore
+from src.preprocessing.labels import LabelIndex
+
+class SceneCache:
+    """Bounded LRU cache of decoded scene images with hit/miss counters.
+
+    Each DataLoader worker holds its own copy of the cache, while the counters
+    live in shared memory so the main process sees the totals of all workers.
+    The counters are created in a spawn context: a fork-context lock cannot be
+    sent to spawn or forkserver workers, while a spawn-context one works with
+    every DataLoader multiprocessing_context.
+    """
+
+    def __init__(self, max_scenes=8):
+        self.max_scenes = max_scenes
+        self._images = OrderedDict()
+        self._counts = multiprocessing.get_context("spawn").Array('q', 2)  # hits, misses
+
+    def get(self, image_path):
+        image = self._images.get(image_path)
+        if image is not None:
+            self._images.move_to_end(image_path)
+            with self._counts.get_lock():
+                self._counts[0] += 1
+            return image
+
+        image = cv2.imread(image_path)
+        with self._counts.get_lock():
+            self._counts[1] += 1
+        if image is None or self.max_scenes <= 0:
+            return image
+
+        self._images[image_path] = image
+        while len(self._images) > self.max_scenes:
+            self._images.popitem(last=False)
+        return image
+
+    def stats(self):
+        """Return decode hits, misses and hit rate summed over all workers"""
+        with self._counts.get_lock():
+            hits, misses = self._counts[0], self._counts[1]
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+    def reset_stats(self):
+        with self._counts.get_lock():
+            self._counts[0] = 0
+            self._counts[1] = 0
+
+class DisasterDataset(Dataset):
+    def __init__(self, transform=None, image_dir=None, json_dir=None, cache_size=8, crop_store_dir=None,
+                 label_index_path=None):
+        """Dataset for extracting post-disaster building images and labels.
+
+        When crop_store_dir points to shards written by
+        src/preprocessing/crop_store.py, crops are read from the memory-mapped
+        shards instead of decoding and cropping the scene PNGs. Footprints come
+        from a LabelIndex stored at label_index_path (under
+        data/processed/label_index by default) that only re-parses changed
+        label files.
+        """
+        self.image_dir = image_dir or os.path.join(os.getcwd(), "../data/raw/tier3/images")
+        self.json_dir = json_dir or os.path.join(os.getcwd(), "../data/raw/tier3/labels")
+        self.transform = transform
+        self.samples = []
+        self.scene_cache = SceneCache(max_scenes=cache_size)
+        self.crop_store = CropStore(crop_store_dir) if crop_store_dir else None
+        self.label_index_path = label_index_path
+        self.label_index = None
+
+        print("🔄 Loading dataset...")
+        if self.crop_store is not None:
+            self._load_crop_store()
+        else:
+            self._load_data()
+        print(f"Dataset loaded: {len(self.samples)} samples found.")
+
+    def _load_data(self):
+        """Loads image paths, polygons, and labels from the persistent label index."""
+        if not os.path.exists(self.json_dir):
+            print(f"Label directory not found: {self.json_dir}")
+            return
+
+        self.label_index = LabelIndex(self.json_dir, self.label_index_path)
+        self.label_index.update()
+        index = self.label_index
+
+        image_building_count = {}
+        missing_images = set()
+
+        for row in range(len(index)):
+            label = index.subtype[row]
+            if label not in damage_classes:
+                continue
+
+            image_name = str(index.scene[row])
+            if not image_name:
+                continue
+
+            image_path = os.path.join(self.image_dir, image_name)
+            if image_name not in image_building_count:
+                if not os.path.exists(image_path):
+                    missing_images.add(image_name)
+                image_building_count[image_name] = 0
+            if image_name in missing_images:
+                continue
+
+            self.samples.append((image_path, index.polygon(row), damage_classes[label], str(index.uid[row])))
+            image_building_count[image_name] += 1
+
+        for image_name in sorted(missing_images):
+            print(f"Missing image: {os.path.join(self.image_dir, image_name)}, skipping.")
+
+        print("\nNumber of extracted buildings per image (first 10):")
+        for i, (image_name, count) in enumerate(image_building_count.items()):
+            print(f"{i + 1}. {image_name}: {count} buildings")
+            if i == 20:  
+                break
+
+    def _load_crop_store(self):
+        """Loads samples from the crop store index; the polygon slot holds the store row."""
+        index = self.crop_store.index
+        for row, (image_name, uid, label) in enumerate(zip(index['image_name'], index['uid'], index['label'])):
+            image_path = os.path.join(self.image_dir, image_name)
+            self.samples.append((image_path, row, damage_classes[label], uid))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def scene_keys(self):
+        """Scene (image path) of every sample, in sample order."""
+        return [sample[0] for sample in self.samples]
+
+    def decode_stats(self):
+        return self.scene_cache.stats()
+
+    def _crop_building(self, image, polygon):
+        """Extracts a cropped building image from the full image."""
+        x_min, y_min = polygon.min(axis=0).astype(int)
+        x_max, y_max = polygon.max(axis=0).astype(int)
+
+        cropped = image[y_min:y_max, x_min:x_max]
+        return cropped
+
+    def __getitem__(self, idx):
+        """Retrieves a (cropped building image, label, image_name, uid) pair."""
+        image_path, polygon, label,uid= self.samples[idx]  
+        image_name = os.path.basename(image_path) 
+
+        if self.crop_store is not None:
+            # Already cropped and resized, read straight from the shard
+            return self._to_sample(self.crop_store[polygon], label, image_name, uid)
+        
+        image = self.scene_cache.get(image_path)
+        if image is None:
+            print(f"Could not read image: {image_path}, skipping.")
+            return None
+
+        cropped = self._crop_building(image, polygon)
+
+        if cropped.shape[0] == 0 or cropped.shape[1] == 0:
+            print(f"Skipping empty crop in {image_path}")
+            return None
+
+        # Same interpolation as the crop store and preprocess_batch
+        cropped = resize_crop(cropped)
+        return self._to_sample(cropped, label, image_name, uid)
+
+    def _to_sample(self, cropped, label, image_name, uid):
+        cropped = cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB)
+        cropped = torch.tensor(cropped, dtype=torch.float32).permute(2, 0, 1) / 255.0
+
+        if self.transform:
+            cropped = self.transform(cropped)
+
+        return cropped, label, image_name,uid
+
+class SceneGroupedSampler(Sampler):
+    """Yields sample indices scene by scene so each scene is decoded about once per epoch.
+
+    Scene order is shuffled every epoch (call set_epoch before each one). The
+    samples of ``scenes_per_window`` consecutive scenes are shuffled together,
+    which keeps batches mixed while only that many scenes need to be resident
+    in the ``SceneCache``. Use a window no larger than the cache size.
+
+    With DataLoader workers, consecutive batches go to different workers and
+    each worker has its own cache, so every scene is decoded once per worker;
+    use SceneGroupedBatchSampler there.
+    """
+
+    def __init__(self, scene_keys, scenes_per_window=4, shuffle=True, seed=0):
+        self.scenes_per_window = max(1, scenes_per_window)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+        groups = OrderedDict()
+        for idx, key in enumerate(scene_keys):
+            groups.setdefault(key, []).append(idx)
+        self.groups = list(groups.values())
+        self.num_samples = len(scene_keys)
+
+    @classmethod
+    def from_dataset(cls, dataset, **kwargs):
+        """Build a sampler for a DisasterDataset or a Subset of one (e.g. from random_split)."""
+        if isinstance(dataset, Subset):
+            keys = dataset.dataset.scene_keys()
+            return cls([keys[i] for i in dataset.indices], **kwargs)
+        return cls(dataset.scene_keys(), **kwargs)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        return self.num_samples
+
+    def _windows(self):
+        """Sample indices of each window of scenes, in this epoch's order"""
+        rng = random.Random(self.seed + self.epoch)
+        groups = list(self.groups)
+        if self.shuffle:
+            rng.shuffle(groups)
+
+        for start in range(0, len(groups), self.scenes_per_window):
+            window = [idx for group in groups[start:start + self.scenes_per_window] for idx in group]
+            if self.shuffle:
+                rng.shuffle(window)
+            yield window
+
+    def __iter__(self):
+        for window in self._windows():
+            yield from window
+
+class SceneGroupedBatchSampler(SceneGroupedSampler):
+    """Batch sampler that keeps every window of scenes on a single DataLoader worker.
+
+    The DataLoader hands batch i to worker i % num_workers. Windows are
+    dealt to num_workers streams (each to the currently shortest one) and
+    the streams' batches are interleaved in that order, so each worker only
+    sees the scenes of its own windows and decodes each of them once. Only
+    batches emitted after the shorter streams run out at the end of the epoch
+    can land on another worker.
+    """
+
+    def __init__(self, scene_keys, batch_size, num_workers=0, scenes_per_window=4, shuffle=True, seed=0):
+        super().__init__(scene_keys, scenes_per_window=scenes_per_window, shuffle=shuffle, seed=seed)
+        self.batch_size = batch_size
+        self.num_workers = max(1, num_workers)
+        self._batches = None
+
+    def set_epoch(self, epoch):
+        super().set_epoch(epoch)
+        self._batches = None
+
+    def _stream_batches(self):
+        """Batches of every worker stream for the current epoch, built once per epoch.
+
+        The batch count depends on how windows are dealt to streams, and
+        run_epoch asks for len(loader) on every batch.
+        """
+        if self._batches is None or self._batches[0] != self.epoch:
+            streams = [[] for _ in range(self.num_workers)]
+            for window in self._windows():
+                min(streams, key=len).extend(window)
+            self._batches = (self.epoch, [[stream[start:start + self.batch_size]
+                                           for start in range(0, len(stream), self.batch_size)]
+                                          for stream in streams])
+        return self._batches[1]
+
+    def __len__(self):
+        return sum(map(len, self._stream_batches()))
+
+    def __iter__(self):
+        batches = self._stream_batches()
+        for i in range(max(map(len, batches), default=0)):
+            for stream in batches:
+                if i < len(stream):
+                    yield stream[i]
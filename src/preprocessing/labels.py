@@ -0,0 +1,247 @@
+import os
+import json
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from src.utils.hashing import file_sha1
+
+POLYGON_TYPE_ID = 3
+
+def parse_polygons(wkt_strings):
+    """Parse WKT polygons in bulk with shapely.from_wkt.
+
+    Returns a list aligned with wkt_strings holding the exterior ring of each
+    polygon as an (N, 2) float array, or None for anything that is not a
+    non-empty POLYGON.
+    """
+    polygons = [None] * len(wkt_strings)
+    if len(wkt_strings) == 0:
+        return polygons
+
+    geoms = shapely.from_wkt(np.asarray(wkt_strings, dtype=object), on_invalid='ignore')
+    valid = np.flatnonzero(shapely.get_type_id(geoms) == POLYGON_TYPE_ID)
+    rings = shapely.get_exterior_ring(geoms[valid])
+    coords, owner = shapely.get_coordinates(rings, return_index=True)
+    counts = np.bincount(owner, minlength=len(rings))
+
+    for i, ring_coords in zip(valid, np.split(coords, np.cumsum(counts)[:-1])):
+        if len(ring_coords) > 0:
+            polygons[i] = ring_coords
+    return polygons
+
+def parse_polygon(wkt_string):
+    """Parse a single WKT polygon into an (N, 2) array, or None"""
+    return parse_polygons([wkt_string])[0]
+
+def _parse_label_file(json_path, json_file):
+    """Columns of every building in one label file"""
+    with open(json_path, "r") as f:
+        data = json.load(f)
+
+    scene = data.get("metadata", {}).get("img_name") or ""
+    xy = data.get("features", {}).get("xy", [])
+    lng_lat = {
+        feature.get("properties", {}).get("uid"): feature.get("wkt", "")
+        for feature in data.get("features", {}).get("lng_lat", [])
+    }
+
+    uids = [building.get("properties", {}).get("uid", "unknown") for building in xy]
+    subtypes = [building.get("properties", {}).get("subtype", "unknown") for building in xy]
+    polygons = parse_polygons([building.get("wkt", "") for building in xy])
+
+    keep = [i for i, polygon in enumerate(polygons) if polygon is not None]
+    polygons = [polygons[i] for i in keep]
+    uids = [uids[i] for i in keep]
+
+    bbox = np.array([np.r_[p.min(axis=0), p.max(axis=0)] for p in polygons], dtype=np.float64).reshape(-1, 4)
+
+    geo = shapely.from_wkt(np.array([lng_lat.get(uid) or "POLYGON EMPTY" for uid in uids], dtype=object),
+                           on_invalid='ignore')
+    centroids = shapely.get_coordinates(shapely.centroid(geo), include_z=False, return_index=True)
+    lng_lat_centroid = np.full((len(uids), 2), np.nan)
+    lng_lat_centroid[centroids[1]] = centroids[0]
+
+    return {
+        'file': [json_file] * len(keep),
+        'scene': [scene] * len(keep),
+        'uid': uids,
+        'subtype': [subtypes[i] for i in keep],
+        'bbox': bbox,
+        'polygons': polygons,
+        'lng_lat_centroid': lng_lat_centroid
+    }
+
+# Repository root (src/preprocessing/labels.py -> ../..), so the default index does not depend on the working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def default_index_path(json_dir):
+    """data/processed/label_index/<dataset>_<hash>.npz, one index per labels directory"""
+    json_dir = os.path.abspath(json_dir)
+    name = os.path.basename(os.path.dirname(json_dir)) or "labels"
+    key = hashlib.sha1(json_dir.encode()).hexdigest()[:12]
+    return os.path.join(PROJECT_ROOT, "data", "processed", "label_index", f"{name}_{key}.npz")
+
+class LabelIndex:
+    """Columnar index of every building footprint in a directory of xView2 labels.
+
+    The index is stored as a single .npz file next to a manifest of the
+    mtime, size and sha1 of every label file it was built from. update()
+    re-parses only the files whose mtime/size changed and whose content hash
+    differs, so re-opening an unchanged tier3 directory costs one stat per file.
+
+    Columns (one row per building): file, scene, uid, subtype, bbox
+    (x_min, y_min, x_max, y_max in pixels), lng_lat_centroid. Pixel polygons
+    are stored flat in poly_coords and addressed through poly_offsets.
+    """
+
+    def __init__(self, json_dir, index_path=None, post_only=True):
+        self.json_dir = json_dir
+        self.index_path = index_path or default_index_path(json_dir)
+        self.post_only = post_only
+        self.manifest = {}
+        self._set_columns(self._empty_columns())
+
+    @staticmethod
+    def _empty_columns():
+        return {
+            'file': [], 'scene': [], 'uid': [], 'subtype': [],
+            'bbox': np.empty((0, 4)),
+            'polygons': [],
+            'lng_lat_centroid': np.empty((0, 2))
+        }
+
+    def _set_columns(self, columns):
+        self.file = np.asarray(columns['file'], dtype=str)
+        self.scene = np.asarray(columns['scene'], dtype=str)
+        self.uid = np.asarray(columns['uid'], dtype=str)
+        self.subtype = np.asarray(columns['subtype'], dtype=str)
+        self.bbox = np.asarray(columns['bbox'], dtype=np.float64).reshape(-1, 4)
+        self.lng_lat_centroid = np.asarray(columns['lng_lat_centroid'], dtype=np.float64).reshape(-1, 2)
+
+        polygons = columns['polygons']
+        counts = np.array([len(p) for p in polygons], dtype=np.int64)
+        self.poly_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.poly_coords = (np.concatenate(polygons).astype(np.float64) if polygons
+                            else np.empty((0, 2)))
+
+    def _columns(self, rows):
+        return {
+            'file': self.file[rows], 'scene': self.scene[rows],
+            'uid': self.uid[rows], 'subtype': self.subtype[rows],
+            'bbox': self.bbox[rows],
+            'polygons': [self.polygon(row) for row in rows],
+            'lng_lat_centroid': self.lng_lat_centroid[rows]
+        }
+
+    def __len__(self):
+        return len(self.uid)
+
+    def polygon(self, row):
+        """Pixel polygon of one building as an (N, 2) array"""
+        return self.poly_coords[self.poly_offsets[row]:self.poly_offsets[row + 1]]
+
+    def scene_rows(self, scene):
+        return np.flatnonzero(self.scene == scene)
+
+    def to_frame(self):
+        """Scalar columns as a DataFrame (polygons excluded)"""
+        return pd.DataFrame({
+            'file': self.file, 'scene': self.scene, 'uid': self.uid, 'subtype': self.subtype,
+            'x_min': self.bbox[:, 0], 'y_min': self.bbox[:, 1],
+            'x_max': self.bbox[:, 2], 'y_max': self.bbox[:, 3],
+            'lng': self.lng_lat_centroid[:, 0], 'lat': self.lng_lat_centroid[:, 1]
+        })
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return False
+        with np.load(self.index_path) as archive:
+            self.manifest = json.loads(str(archive['manifest']))
+            self.file, self.scene = archive['label_file'], archive['scene']
+            self.uid, self.subtype = archive['uid'], archive['subtype']
+            self.bbox, self.lng_lat_centroid = archive['bbox'], archive['lng_lat_centroid']
+            self.poly_offsets, self.poly_coords = archive['poly_offsets'], archive['poly_coords']
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = self.index_path + ".tmp.npz"
+        np.savez(tmp_path, manifest=np.array(json.dumps(self.manifest)),
+                 label_file=self.file, scene=self.scene, uid=self.uid, subtype=self.subtype,
+                 bbox=self.bbox, lng_lat_centroid=self.lng_lat_centroid,
+                 poly_offsets=self.poly_offsets, poly_coords=self.poly_coords)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self):
+        """Bring the index in line with json_dir, re-parsing only changed files.
+
+        Returns:
+            int: Number of label files that were (re-)parsed
+        """
+        self.load()
+
+        label_files = sorted(
+            f for f in os.listdir(self.json_dir)
+            if f.endswith(".json") and (not self.post_only or 'post' in f)
+        )
+
+        manifest, changed = {}, []
+        for json_file in label_files:
+            stat = os.stat(os.path.join(self.json_dir, json_file))
+            entry = {'mtime': stat.st_mtime, 'size': stat.st_size}
+            previous = self.manifest.get(json_file)
+            if previous and previous['mtime'] == entry['mtime'] and previous['size'] == entry['size']:
+                manifest[json_file] = previous
+                continue
+
+            entry['sha1'] = file_sha1(os.path.join(self.json_dir, json_file))
+            if not previous or previous.get('sha1') != entry['sha1']:
+                changed.append(json_file)
+            manifest[json_file] = entry
+
+        removed = set(self.manifest) - set(manifest)
+        if not changed and not removed:
+            if manifest != self.manifest:
+                self.manifest = manifest
+                self.save()
+            return 0
+
+        stale = set(changed) | removed
+        keep = np.flatnonzero(~np.isin(self.file, list(stale))) if len(self.file) else np.empty(0, dtype=np.int64)
+        parts = [self._columns(keep)]
+        for json_file in changed:
+            parts.append(_parse_label_file(os.path.join(self.json_dir, json_file), json_file))
+
+        merged = {key: [value for part in parts for value in part[key]]
+                  for key in ('file', 'scene', 'uid', 'subtype', 'polygons')}
+        merged['bbox'] = np.concatenate([np.asarray(part['bbox']).reshape(-1, 4) for part in parts])
+        merged['lng_lat_centroid'] = np.concatenate(
+            [np.asarray(part['lng_lat_centroid']).reshape(-1, 2) for part in parts])
+
+        self._set_columns(merged)
+        self.manifest = manifest
+        self.save()
+        print(f"Label index updated: {len(changed)} files parsed, {len(removed)} removed, {len(self)} buildings")
+        return len(changed)
+
+def load_label_index(json_dir, index_path=None):
+    """Open the label index for json_dir, rebuilding stale entries first"""
+    index = LabelIndex(json_dir, index_path)
+    index.update()
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh the xView2 label index")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    index = load_label_index(args.labels, args.output)
+    print(f"{len(index)} buildings indexed at {index.index_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import json
+import time
+import queue
+import base64
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import torch
+
+from src.models.classifier import damage_classes, load_model, ARCHITECTURES, MODEL_VARIANTS
+from src.models.inference import crop_buildings, preprocess_batch
+from src.models.cascade import load_cascade
+
+class MicroBatcher:
+    """Coalesces concurrent requests into dynamic micro-batches.
+
+    A single thread owns the model. It waits for the first pending request,
+    then keeps collecting until max_batch_size crops are queued or
+    max_latency_ms has passed since that first request, and runs one forward
+    pass for all of them.
+    """
+
+    def __init__(self, model, device, max_batch_size=64, max_latency_ms=20):
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.batches_run = 0
+        self.crops_scored = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs):
+        """Queue a (N, 3, 224, 224) tensor; the future resolves to (N, num_classes) softmax scores"""
+        future = Future()
+        if len(inputs) == 0:
+            future.set_result(np.empty((0, len(damage_classes)), dtype=np.float32))
+        else:
+            self._queue.put((inputs, future))
+        return future
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.monotonic() + self.max_latency
+        while count < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                inputs = torch.cat([item[0] for item in pending])
+                scores = []
+                with torch.inference_mode():
+                    for start in range(0, len(inputs), self.max_batch_size):
+                        outputs = self.model(inputs[start:start + self.max_batch_size].to(self.device))
+                        scores.append(torch.softmax(outputs, dim=1).float().cpu().numpy())
+                        self.batches_run += 1
+                scores = np.concatenate(scores)
+                self.crops_scored += len(scores)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for item_inputs, future in pending:
+                future.set_result(scores[start:start + len(item_inputs)])
+                start += len(item_inputs)
+
+def _read_request(payload, allow_local_paths=False):
+    """Decode the scene image and label JSON from a request body.
+
+    Accepts either inline data ({"image": <base64 PNG/JPEG>, "label": <xView2 JSON>})
+    or, only with allow_local_paths, paths on the server
+    ({"image_path": ..., "label_path": ...}).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("request body must be a JSON object")
+    if ("image_path" in payload or "label_path" in payload) and not allow_local_paths:
+        raise PermissionError("image_path/label_path are disabled, start the server with --allow-local-paths")
+
+    if "label_path" in payload:
+        with open(payload["label_path"], "r") as f:
+            label = json.load(f)
+    else:
+        label = payload["label"]
+
+    if "image_path" in payload:
+        image = cv2.imread(payload["image_path"])
+    else:
+        buffer = np.frombuffer(base64.b64decode(payload["image"]), dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("could not decode the scene image")
+    if not isinstance(label, dict):
+        raise ValueError("label must be an xView2 label JSON object")
+    return image, label
+
+def make_handler(batcher, request_timeout=60.0, allow_local_paths=False):
+    class_names = list(damage_classes.keys())
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, {
+                "status": "ok",
+                "batches_run": batcher.batches_run,
+                "crops_scored": batcher.crops_scored
+            })
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            start = time.perf_counter()
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                image, label = _read_request(payload, allow_local_paths)
+            except PermissionError as e:
+                self._send_json(403, {"error": str(e)})
+                return
+            except KeyError as e:
+                self._send_json(400, {"error": f"missing field {e}"})
+                return
+            except (ValueError, TypeError, OSError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            # Crop and preprocess in the request thread, only the forward pass is shared
+            try:
+                buildings = crop_buildings(image, label)
+                inputs = preprocess_batch([b['crop'] for b in buildings])
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self._send_json(400, {"error": f"malformed label: {e!r}"})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            try:
+                scores = batcher.submit(inputs).result(timeout=request_timeout)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            self._send_json(200, {
+                "image_name": label.get("metadata", {}).get("img_name"),
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "buildings": [
+                    {
+                        "building_id": b['building_id'],
+                        "true_label": b['true_label'],
+                        "predicted_label": class_names[int(s.argmax())],
+                        "scores": dict(zip(class_names, map(float, s)))
+                    }
+                    for b, s in zip(buildings, scores)
+                ]
+            })
+
+        def log_message(self, format, *args):
+            pass  # keep the console readable under load
+
+    return PredictionHandler
+
+def serve(checkpoint_path, host="127.0.0.1", port=8000, variant="eager", max_batch_size=64, max_latency_ms=20,
+          screening_path=None, threshold=0.9, architecture="resnet50", allow_local_paths=False):
+    if screening_path:
+        model, device = load_cascade(screening_path, checkpoint_path, threshold, variant, architecture=architecture)
+    else:
+        model, device = load_model(checkpoint_path, variant=variant, architecture=architecture)
+    batcher = MicroBatcher(model, device, max_batch_size=max_batch_size, max_latency_ms=max_latency_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, allow_local_paths=allow_local_paths))
+    print(f"Serving {checkpoint_path} ({variant}) on http://{host}:{port} "
+          f"(batch <= {max_batch_size}, wait <= {max_latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local micro-batching damage classification service")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="eager")
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default="resnet50")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=20)
+    parser.add_argument("--screening-checkpoint", default=None, help="serve as a cascade behind this first-stage model")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--allow-local-paths", action="store_true",
+                        help="accept image_path/label_path requests that read files on this machine")
+    args = parser.parse_args()
+
+    serve(args.checkpoint, host=args.host, port=args.port, variant=args.variant,
+          max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms,
+          screening_path=args.screening_checkpoint, threshold=args.threshold, architecture=args.architecture,
+          allow_local_paths=args.allow_local_paths)
+
+if __name__ == "__main__":
+    main()
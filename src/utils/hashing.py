@@ -0,0 +1,9 @@
+import hashlib
+
+def file_sha1(path, chunk_size=1 << 20):
+    """SHA-1 hex digest of a file, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
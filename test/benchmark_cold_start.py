@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def cold_start(checkpoint_path, variant, legacy=False):
+    """Time imports, model loading and the first forward pass in this (fresh) process"""
+    start = time.perf_counter()
+    sys.path.append(ROOT)
+    import torch
+    from src.models.classifier import ImprovedDamageClassifier, load_model
+    imported = time.perf_counter()
+
+    if legacy:
+        # Previous behaviour: ImageNet weights first, then overwritten by the checkpoint
+        model = ImprovedDamageClassifier(num_classes=4, pretrained=True)
+        model.load_state_dict(torch.load(checkpoint_path, map_location="cpu"))
+        model.eval()
+    else:
+        model, _ = load_model(checkpoint_path, variant=variant)
+    loaded = time.perf_counter()
+
+    with torch.inference_mode():
+        model(torch.zeros(1, 3, 224, 224))
+    first_inference = time.perf_counter()
+
+    return {
+        'import_s': imported - start,
+        'load_s': loaded - imported,
+        'first_inference_s': first_inference - loaded,
+        'total_s': first_inference - start
+    }
+
+def variant_path(value):
+    """argparse type for --variant: 'variant=path' -> (variant, path)"""
+    variant, sep, path = value.partition("=")
+    if not sep or not variant or not path:
+        raise argparse.ArgumentTypeError(f"expected variant=path (e.g. eager=checkpoints/improved_model.pth), got '{value}'")
+    return variant, path
+
+def run_child(checkpoint_path, variant, legacy=False, offline=True):
+    """Run cold_start in a new interpreter; offline hides any proxy and the torch hub cache"""
+    env = dict(os.environ)
+    command = [sys.executable, os.path.abspath(__file__), "--child",
+               "--variant", f"{variant}={checkpoint_path}"] + (["--legacy"] if legacy else [])
+    with tempfile.TemporaryDirectory(prefix="empty_torch_home_") as torch_home:
+        if offline:
+            for name in ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY"):
+                env.pop(name, None)
+            env["TORCH_HOME"] = torch_home
+        start = time.perf_counter()
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed", 'wall_s': wall}
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['wall_s'] = wall
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time of load_model in fresh processes")
+    parser.add_argument("--variant", action="append", type=variant_path, default=None,
+                        help="variant=path, defaults to eager=checkpoints/improved_model.pth")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true", help="also time the old pretrained-download path")
+    parser.add_argument("--online", action="store_true", help="keep proxies and the torch hub cache")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.child:
+        variant, path = args.variant[0] if args.variant else ("eager", args.checkpoint)
+        print(json.dumps(cold_start(path, variant, legacy=args.legacy)))
+        return
+
+    runs = args.variant or [("eager", args.checkpoint)]
+    runs = [(variant, path, False) for variant, path in runs]
+    if args.legacy:
+        runs.append(("eager", args.checkpoint, True))
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from benchmark_inference import git_commit
+    commit = git_commit()
+
+    results = {}
+    for variant, path, legacy in runs:
+        name = f"{variant}{' (legacy)' if legacy else ''}"
+        samples = [run_child(path, variant, legacy, offline=not args.online) for _ in range(args.repeats)]
+        errors = [s['error'] for s in samples if 'error' in s]
+        if errors:
+            results[name] = {'checkpoint': path, 'error': errors[0]}
+            print(f"{name:<22} failed: {errors[0]}")
+            continue
+        summary = {key: float(np.median([s[key] for s in samples]))
+                   for key in ('import_s', 'load_s', 'first_inference_s', 'total_s', 'wall_s')}
+        results[name] = dict(summary, checkpoint=path, repeats=args.repeats)
+        print(f"{name:<22} import {summary['import_s']:.2f} s  load {summary['load_s']:.2f} s  "
+              f"first inference {summary['first_inference_s']:.2f} s  process wall {summary['wall_s']:.2f} s")
+
+    output_path = args.output or os.path.join("output", "benchmarks", f"cold_start_{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump({'commit': commit, 'offline': not args.online, 'results': results}, f, indent=4)
+    print(f"\nSaved cold-start results to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import cv2
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.classifier import load_model, damage_classes, MODEL_VARIANTS
+from src.models.inference import preprocess_image, preprocess_batch, predict_damage, predict_damage_batch, crop_buildings
+from src.evaluation.writers import IMAGE_FORMATS
+from test_model import visualize_predictions
+
+def peak_rss_mb():
+    """Peak resident set size of this process (VmHWM) in MB"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def reset_peak_rss():
+    """Reset VmHWM so the next reading covers only the following stage (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def time_stage(fn, repeats=3, items=1, warmup=1):
+    """Run fn repeatedly and summarise its latency and throughput"""
+    for _ in range(warmup):
+        fn()
+    reset_peak_rss()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    return {
+        "repeats": repeats,
+        "items": items,
+        "mean_ms": float(latencies.mean() * 1000),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "items_per_sec": float(items / latencies.mean()) if latencies.mean() > 0 else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def scene_label_files(json_dir, num_scenes=None):
+    """The first num_scenes post-disaster label files in name order"""
+    return sorted(f for f in os.listdir(json_dir) if f.endswith(".json") and 'post' in f)[:num_scenes]
+
+def load_scenes(json_dir, image_dir, num_scenes=None):
+    scenes = []
+    for json_file in scene_label_files(json_dir, num_scenes):
+        with open(os.path.join(json_dir, json_file), "r") as f:
+            data = json.load(f)
+        image = cv2.imread(os.path.join(image_dir, data["metadata"]["img_name"]))
+        if image is not None:
+            scenes.append((image, data))
+    return scenes
+
+def make_synthetic_scenes(output_dir, num_scenes, buildings_per_scene, image_size=1024, seed=0):
+    """Write random scenes with axis-aligned building footprints in xView2 layout"""
+    rng = np.random.default_rng(seed)
+    image_dir = os.path.join(output_dir, "images")
+    json_dir = os.path.join(output_dir, "labels")
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(json_dir, exist_ok=True)
+
+    class_names = list(damage_classes.keys())
+    for s in range(num_scenes):
+        image_name = f"synthetic_{s:08d}_post_disaster.png"
+        image = rng.integers(0, 256, (image_size, image_size, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(image_dir, image_name), image)
+
+        features = []
+        for b in range(buildings_per_scene):
+            w, h = rng.integers(8, 80, 2)
+            x, y = rng.integers(0, image_size - 80, 2)
+            coords = [(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)]
+            features.append({
+                "properties": {"feature_type": "building", "subtype": class_names[rng.integers(0, 4)],
+                               "uid": f"{s}-{b}"},
+                "wkt": "POLYGON ((" + ", ".join(f"{px:.1f} {py:.1f}" for px, py in coords) + "))"
+            })
+        with open(os.path.join(json_dir, image_name.replace(".png", ".json")), "w") as f:
+            json.dump({"features": {"lng_lat": [], "xy": features}, "metadata": {"img_name": image_name}}, f)
+    return json_dir, image_dir
+
+def benchmark_scenes(model, device, json_dir, image_dir, num_scenes, batch_sizes, repeats, prefix):
+    results = {}
+    scenes = load_scenes(json_dir, image_dir, num_scenes)
+    buildings = [b for image, data in scenes for b in crop_buildings(image, data)]
+    crops = [b['crop'] for b in buildings]
+    num_buildings = len(crops)
+    print(f"[{prefix}] {len(scenes)} scenes, {num_buildings} buildings")
+
+    results[f"{prefix}/crop_buildings"] = time_stage(
+        lambda: [crop_buildings(image, data) for image, data in scenes], repeats, num_buildings)
+    results[f"{prefix}/preprocess_image"] = time_stage(
+        lambda: [preprocess_image(crop) for crop in crops], repeats, num_buildings)
+    for batch_size in batch_sizes:
+        results[f"{prefix}/preprocess_batch_bs{batch_size}"] = time_stage(
+            lambda: [preprocess_batch(crops[start:start + batch_size])
+                     for start in range(0, num_buildings, batch_size)], repeats, num_buildings)
+    results[f"{prefix}/predict_damage"] = time_stage(
+        lambda: [predict_damage(model, device, crop) for crop in crops], repeats, num_buildings)
+    for batch_size in batch_sizes:
+        results[f"{prefix}/predict_damage_batch_bs{batch_size}"] = time_stage(
+            lambda: predict_damage_batch(model, device, crops, batch_size=batch_size), repeats, num_buildings)
+        results[f"{prefix}/predict_damage_batch_bs{batch_size}_channels_last"] = time_stage(
+            lambda: predict_damage_batch(model, device, crops, batch_size=batch_size, channels_last=True),
+            repeats, num_buildings)
+
+    # Same scenes as above, so the building count matches what visualize_predictions scores
+    json_files = scene_label_files(json_dir, num_scenes)
+    output_dir = tempfile.mkdtemp(prefix="benchmark_vis_")
+    try:
+        for image_format in IMAGE_FORMATS:
+            results[f"{prefix}/visualize_predictions_{image_format}"] = time_stage(
+                lambda: visualize_predictions(model, device, json_dir, image_dir, output_dir,
+                                              num_images=len(json_files), image_format=image_format,
+                                              json_files=json_files),
+                repeats, num_buildings)
+        results[f"{prefix}/visualize_predictions_metrics_only"] = time_stage(
+            lambda: visualize_predictions(model, device, json_dir, image_dir, output_dir,
+                                          num_images=len(json_files), render=False, json_files=json_files),
+            repeats, num_buildings)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the building damage inference hot path")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="eager")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/sample/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/sample/images"))
+    parser.add_argument("--num-scenes", type=int, default=4)
+    parser.add_argument("--synthetic-buildings", type=int, nargs="*", default=[50, 200],
+                        help="buildings per synthetic scene, one benchmark per value")
+    parser.add_argument("--synthetic-scenes", type=int, default=2)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    model, device = load_model(args.checkpoint, variant=args.variant)
+    commit = git_commit()
+
+    results = benchmark_scenes(model, device, args.labels, args.images, args.num_scenes,
+                               args.batch_sizes, args.repeats, "sample")
+
+    for buildings_per_scene in args.synthetic_buildings:
+        synthetic_dir = tempfile.mkdtemp(prefix="benchmark_scenes_")
+        try:
+            json_dir, image_dir = make_synthetic_scenes(synthetic_dir, args.synthetic_scenes, buildings_per_scene)
+            results.update(benchmark_scenes(model, device, json_dir, image_dir, args.synthetic_scenes,
+                                            args.batch_sizes, args.repeats, f"synthetic_{buildings_per_scene}"))
+        finally:
+            shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "variant": args.variant,
+        "device": str(device),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+    output_path = args.output or os.path.join("output", "benchmarks", f"inference_{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(f"\n{'stage':<50} {'mean ms':>10} {'buildings/s':>12} {'peak MB':>9}")
+    for stage, r in results.items():
+        items_per_sec = f"{r['items_per_sec']:.1f}" if r['items_per_sec'] is not None else "n/a"
+        print(f"{stage:<50} {r['mean_ms']:>10.1f} {items_per_sec:>12} {r['peak_rss_mb']:>9.0f}")
+    print(f"\nSaved benchmark results to {output_path}")
+
+if __name__ == "__main__":
+    main()
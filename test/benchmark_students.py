@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.classifier import load_model, STUDENT_BACKBONES
+from src.models.inference import predict_damage_batch
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.preprocessing.crop_store import CropStore
+from check_variant_parity import load_validation_crops
+
+def benchmark_models(models, crops, true_labels, batch_size=64, warmup=1):
+    """CPU buildings/sec and macro-F1 for each (name, architecture, variant, checkpoint)"""
+    results = []
+    for name, architecture, variant, checkpoint_path in models:
+        model, device = load_model(checkpoint_path, variant=variant, architecture=architecture)
+        if device.type != "cpu":
+            model, device = model.cpu(), torch.device("cpu")
+        # Quantized layers hide their weights from parameters(), so only count eager models
+        parameters = sum(p.numel() for p in model.parameters()) if variant == "eager" else None
+
+        predict_damage_batch(model, device, crops[:batch_size * warmup], batch_size=batch_size)
+        start = time.perf_counter()
+        predicted, _ = predict_damage_batch(model, device, crops, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        results.append({
+            'model': name,
+            'architecture': architecture,
+            'variant': variant,
+            'parameters_m': parameters / 1e6 if parameters else None,
+            'buildings_per_sec': len(crops) / elapsed,
+            'macro_f1': ConfusionMatrixAccumulator().update(true_labels, predicted).f1("macro")
+        })
+        print(f"{name:<28} {variant:<13} {results[-1]['buildings_per_sec']:>8.1f} buildings/s  "
+              f"macro-F1 {results[-1]['macro_f1']:.4f}")
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput vs macro-F1 of the teacher and distilled students on CPU")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth", help="teacher checkpoint")
+    parser.add_argument("--student", action="append", default=[],
+                        help="backbone=path, e.g. resnet18=checkpoints/student_resnet18.pth")
+    parser.add_argument("--variants", nargs="+", choices=["eager", "dynamic_int8"], default=["eager", "dynamic_int8"])
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads, e.g. a laptop's core count")
+    parser.add_argument("--csv", default="data/raw/val_predictions3.csv")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="output/student_benchmark.csv")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    models = [("teacher (resnet50)", "resnet50", variant, args.checkpoint) for variant in args.variants]
+    for student in args.student:
+        backbone, path = student.split("=", 1)
+        if backbone not in STUDENT_BACKBONES:
+            parser.error(f"unknown student backbone '{backbone}', expected one of {tuple(STUDENT_BACKBONES)}")
+        models += [(f"student ({backbone})", backbone, variant, path) for variant in args.variants]
+
+    crop_store = CropStore(args.crop_store) if args.crop_store else None
+    crops, matched, missing = load_validation_crops(args.csv, args.labels, args.images, crop_store, args.limit)
+    if not crops:
+        raise RuntimeError(f"None of the buildings in {args.csv} were found under {args.labels}")
+    print(f"Scoring {len(crops)} buildings ({missing} not found) with {torch.get_num_threads()} CPU threads\n")
+
+    report = benchmark_models(models, crops, matched['True Labels'].to_numpy(), batch_size=args.batch_size)
+    print("\n" + report.to_string(index=False))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    report.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import pandas as pd
+from sklearn.metrics import f1_score
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.classifier import load_model, MODEL_VARIANTS
+from src.models.inference import crop_buildings, predict_damage_batch
+from src.preprocessing.crop_store import CropStore
+
+def load_validation_crops(csv_path, json_dir, image_dir, crop_store=None, limit=None):
+    """Re-crop the buildings listed in a val_predictions CSV.
+
+    Returns the crops, the matching CSV rows, and the number of CSV rows
+    that could not be found in the labels/images.
+    """
+    predictions = pd.read_csv(csv_path)
+    if limit:
+        predictions = predictions.head(limit)
+
+    crops, rows = [], []
+    for image_name, group in predictions.groupby('Image Name', sort=False):
+        if crop_store is not None:
+            for row_idx, uid in zip(group.index, group['Building UID']):
+                crop = crop_store.get_crop(image_name, uid)
+                if crop is not None:
+                    crops.append(crop)
+                    rows.append(row_idx)
+            continue
+
+        json_path = os.path.join(json_dir, os.path.splitext(image_name)[0] + ".json")
+        image = cv2.imread(os.path.join(image_dir, image_name))
+        if image is None or not os.path.exists(json_path):
+            continue
+        with open(json_path, "r") as f:
+            data = json.load(f)
+
+        scene_crops = {b['building_id']: b['crop'] for b in crop_buildings(image, data)}
+        for row_idx, uid in zip(group.index, group['Building UID']):
+            if uid in scene_crops:
+                crops.append(scene_crops[uid])
+                rows.append(row_idx)
+
+    matched = predictions.loc[rows].reset_index(drop=True)
+    return crops, matched, len(predictions) - len(matched)
+
+def check_parity(variants, csv_path, json_dir, image_dir, crop_store=None, batch_size=64, limit=None):
+    """Score every variant on the validation buildings and compare macro-F1.
+
+    Args:
+        variants (list): (variant, checkpoint_path) pairs understood by load_model
+
+    Returns:
+        pd.DataFrame: One row per variant with macro-F1, its delta against the
+        predictions stored in the CSV, agreement with the first variant and
+        buildings/sec
+    """
+    crops, matched, missing = load_validation_crops(csv_path, json_dir, image_dir, crop_store, limit)
+    if not crops:
+        raise RuntimeError(f"None of the buildings in {csv_path} were found under {json_dir}")
+    print(f"Re-scoring {len(crops)} buildings ({missing} not found)")
+
+    true_labels = matched['True Labels'].to_numpy()
+    reference_f1 = f1_score(true_labels, matched['Predicted Labels'], average="macro")
+
+    results = []
+    baseline = None
+    for variant, checkpoint_path in variants:
+        model, device = load_model(checkpoint_path, variant=variant)
+
+        start = time.perf_counter()
+        predicted, _ = predict_damage_batch(model, device, crops, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = predicted
+        macro_f1 = f1_score(true_labels, predicted, average="macro")
+        results.append({
+            'variant': variant,
+            'checkpoint': checkpoint_path,
+            'macro_f1': macro_f1,
+            'delta_vs_csv': macro_f1 - reference_f1,
+            'agreement_vs_first': (predicted == baseline).mean(),
+            'buildings_per_sec': len(crops) / elapsed
+        })
+
+    print(f"Macro-F1 of the stored predictions: {reference_f1:.4f}")
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exported/quantized model variants on val_predictions3.csv")
+    parser.add_argument("--variant", action="append", default=None,
+                        help="variant=path, e.g. static_int8=checkpoints/improved_model_static_int8.pt")
+    parser.add_argument("--csv", default="data/raw/val_predictions3.csv")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="output/variant_parity.csv")
+    args = parser.parse_args()
+
+    checkpoint_path = "checkpoints/improved_model.pth"
+    variants = [("eager", checkpoint_path), ("dynamic_int8", checkpoint_path)]
+    if args.variant:
+        variants = [tuple(v.split("=", 1)) for v in args.variant]
+    for variant, _ in variants:
+        if variant not in MODEL_VARIANTS:
+            parser.error(f"unknown variant '{variant}', expected one of {MODEL_VARIANTS}")
+
+    crop_store = CropStore(args.crop_store) if args.crop_store else None
+    report = check_parity(variants, args.csv, args.labels, args.images, crop_store,
+                          batch_size=args.batch_size, limit=args.limit)
+
+    print("\nVariant parity:")
+    print(report.to_string(index=False))
+    report.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
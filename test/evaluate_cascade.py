@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.classifier import load_model, MODEL_VARIANTS
+from src.models.cascade import CascadeClassifier, load_screening_model, NO_DAMAGE
+from src.models.inference import predict_damage_batch
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.preprocessing.crop_store import CropStore
+from check_variant_parity import load_validation_crops
+
+def timed_scores(model, device, crops, batch_size):
+    start = time.perf_counter()
+    _, scores = predict_damage_batch(model, device, crops, batch_size=batch_size)
+    return scores, time.perf_counter() - start
+
+def macro_f1(true_labels, predicted):
+    return ConfusionMatrixAccumulator().update(true_labels, predicted).f1("macro")
+
+def evaluate_cascade(first_stage, second_stage, device, crops, true_labels, thresholds, batch_size=64):
+    """Sweep the early-exit threshold from one pass of each stage over every crop.
+
+    Returns:
+        pd.DataFrame: One row per threshold with escalation rate, macro-F1 and
+        the buildings/sec implied by the measured per-stage timings
+    """
+    first_scores, first_time = timed_scores(first_stage, device, crops, batch_size)
+    second_scores, second_time = timed_scores(second_stage, device, crops, batch_size)
+    first_predicted, second_predicted = first_scores.argmax(axis=1), second_scores.argmax(axis=1)
+
+    results = [{'threshold': None, 'escalation_rate': 1.0, 'macro_f1': macro_f1(true_labels, second_predicted),
+                'buildings_per_sec': len(crops) / second_time}]
+    for threshold in thresholds:
+        escalate = first_scores[:, NO_DAMAGE] < threshold
+        predicted = np.where(escalate, second_predicted, first_predicted)
+        results.append({
+            'threshold': threshold,
+            'escalation_rate': escalate.mean(),
+            'macro_f1': macro_f1(true_labels, predicted),
+            'buildings_per_sec': len(crops) / (first_time + escalate.mean() * second_time)
+        })
+    return pd.DataFrame(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalation rate and macro-F1 of the cascade on val_predictions3.csv")
+    parser.add_argument("--screening-checkpoint", default="checkpoints/screening_model.pth")
+    parser.add_argument("--checkpoint", default="checkpoints/improved_model.pth")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="eager")
+    parser.add_argument("--input-size", type=int, default=112)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--threshold", type=float, default=0.9, help="threshold for the end-to-end cascade run")
+    parser.add_argument("--csv", default="data/raw/val_predictions3.csv")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/tier3/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/tier3/images"))
+    parser.add_argument("--crop-store", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="output/cascade_report.csv")
+    args = parser.parse_args()
+
+    crop_store = CropStore(args.crop_store) if args.crop_store else None
+    crops, matched, missing = load_validation_crops(args.csv, args.labels, args.images, crop_store, args.limit)
+    if not crops:
+        raise RuntimeError(f"None of the buildings in {args.csv} were found under {args.labels}")
+    print(f"Scoring {len(crops)} buildings ({missing} not found)")
+    true_labels = matched['True Labels'].to_numpy()
+
+    second_stage, device = load_model(args.checkpoint, variant=args.variant)
+    first_stage = load_screening_model(args.screening_checkpoint, device, args.input_size)
+
+    report = evaluate_cascade(first_stage, second_stage, device, crops, true_labels, args.thresholds, args.batch_size)
+    print(f"Macro-F1 of the stored predictions: {macro_f1(true_labels, matched['Predicted Labels']):.4f}")
+    print("\nCascade sweep (threshold None = second stage only):")
+    print(report.to_string(index=False))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    report.to_csv(args.output, index=False)
+
+    cascade = CascadeClassifier(first_stage, second_stage, args.threshold).eval()
+    scores, elapsed = timed_scores(cascade, device, crops, args.batch_size)
+    print(f"\nEnd-to-end cascade at threshold {args.threshold}: escalation rate {cascade.escalation_rate:.2%}, "
+          f"macro-F1 {macro_f1(true_labels, scores.argmax(axis=1)):.4f}, {len(crops) / elapsed:.1f} buildings/s")
+
+if __name__ == "__main__":
+    main()
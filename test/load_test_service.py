@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import base64
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+def load_scenes(json_dir, image_dir, num_scenes=None, inline=True):
+    """Request bodies for the post-disaster scenes of a labels/images directory"""
+    payloads = []
+    json_files = sorted(f for f in os.listdir(json_dir) if f.endswith(".json") and 'post' in f)
+    for json_file in json_files[:num_scenes]:
+        json_path = os.path.join(json_dir, json_file)
+        with open(json_path, "r") as f:
+            label = json.load(f)
+        image_path = os.path.join(image_dir, label["metadata"]["img_name"])
+        if not os.path.exists(image_path):
+            continue
+        if inline:
+            with open(image_path, "rb") as f:
+                payloads.append({"image": base64.b64encode(f.read()).decode(), "label": label})
+        else:
+            payloads.append({"image_path": os.path.abspath(image_path), "label_path": os.path.abspath(json_path)})
+    return [json.dumps(p).encode() for p in payloads]
+
+def send(url, body, timeout=120):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.loads(response.read())
+    return time.perf_counter() - start, len(result["buildings"])
+
+def run_load_test(url, payloads, concurrency=8, num_requests=100):
+    """Fire num_requests scenes with the given concurrency and summarise latencies"""
+    bodies = [payloads[i % len(payloads)] for i in range(num_requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda body: send(url, body), bodies))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    buildings = sum(r[1] for r in results)
+    return {
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "max_ms": float(latencies.max()),
+        "requests_per_sec": num_requests / elapsed,
+        "buildings_per_sec": buildings / elapsed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for src/service/server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/predict")
+    parser.add_argument("--labels", default=os.path.join(os.getcwd(), "data/raw/sample/labels"))
+    parser.add_argument("--images", default=os.path.join(os.getcwd(), "data/raw/sample/images"))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--paths", action="store_true", help="send file paths instead of inline images (server needs --allow-local-paths)")
+    args = parser.parse_args()
+
+    payloads = load_scenes(args.labels, args.images, inline=not args.paths)
+    print(f"Loaded {len(payloads)} scenes")
+
+    for concurrency in args.concurrency:
+        report = run_load_test(args.url, payloads, concurrency=concurrency, num_requests=args.requests)
+        print(f"concurrency={concurrency:>3}  p50={report['p50_ms']:.1f} ms  p99={report['p99_ms']:.1f} ms  "
+              f"{report['requests_per_sec']:.2f} req/s  {report['buildings_per_sec']:.1f} buildings/s")
+
+if __name__ == "__main__":
+    main()
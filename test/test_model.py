@@ -1,95 +1,41 @@
 import os
+import sys
 import json
 import cv2
-import numpy as np
-import matplotlib.pyplot as plt
-import torch
-import torchvision.transforms as transforms
-from torchvision.models import resnet50
-import torch.nn as nn
 import pandas as pd
-from sklearn.metrics import classification_report, confusion_matrix
-import seaborn as sns
-
-# Define damage classes and colors
-damage_classes = {
-    "no-damage": 0,
-    "minor-damage": 1,
-    "major-damage": 2,
-    "destroyed": 3
-}
-
-damage_colors = {
-    "no-damage": (0, 255, 0),      # Green
-    "minor-damage": (255, 255, 0), # Yellow
-    "major-damage": (255, 165, 0), # Orange
-    "destroyed": (255, 0, 0)       # Red
-}
-
-class ImprovedDamageClassifier(nn.Module):
-    def __init__(self, num_classes=4, dropout_prob=0.5):
-        super(ImprovedDamageClassifier, self).__init__()
-        self.resnet = resnet50(pretrained=True)
-        self.resnet = nn.Sequential(*list(self.resnet.children())[:-1])
-        
-        self.fc1 = nn.Linear(2048, 1024)
-        self.bn1 = nn.BatchNorm1d(1024)
-        self.fc2 = nn.Linear(1024, 512)
-        self.bn2 = nn.BatchNorm1d(512)
-        self.fc3 = nn.Linear(512, num_classes)
-        self.dropout = nn.Dropout(dropout_prob)
-
-    def forward(self, x):
-        x = self.resnet(x)
-        x = x.view(x.size(0), -1)
-        
-        x = self.fc1(x)
-        x = self.bn1(x)
-        x = nn.ReLU()(x)
-        x = self.dropout(x)
-        
-        x = self.fc2(x)
-        x = self.bn2(x)
-        x = nn.ReLU()(x)
-        x = self.dropout(x)
-        
-        x = self.fc3(x)
-        return x
-
-def load_model(checkpoint_path):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = ImprovedDamageClassifier(num_classes=4).to(device)
-    model.load_state_dict(torch.load(checkpoint_path, map_location=device))
-    model.eval()
-    return model, device
-
-def preprocess_image(image):
-    transform = transforms.Compose([
-        transforms.ToPILImage(),
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    return transform(image)
-
-def predict_damage(model, device, image):
-    with torch.no_grad():
-        image = preprocess_image(image).unsqueeze(0).to(device)
-        outputs = model(image)
-        _, predicted = torch.max(outputs, 1)
-        return predicted.item()
-
-def visualize_predictions(model, device, json_dir, image_dir, output_dir, num_images=10):
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.classifier import damage_classes, load_model
+from src.models.inference import predict_damage_batch, crop_buildings, label_buildings
+from src.evaluation.reports import save_accumulated_metrics
+from src.evaluation.metrics import ConfusionMatrixAccumulator
+from src.evaluation.writers import VisualizationWriter
+from src.evaluation.geo_export import GeoPredictionWriter, lng_lat_footprints
+
+def visualize_predictions(model, device, json_dir, image_dir, output_dir, num_images=10, batch_size=64, crop_store=None,
+                          prediction_cache=None, render=True, image_format="png", quality=None, render_threads=2,
+                          geo_output=None, json_files=None):
+    """Score, draw and evaluate up to num_images post-disaster scenes.
+
+    json_files fixes the label files to consider and their order
+    (default: os.listdir(json_dir)).
+    """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Initialize lists for performance metrics
-    all_true_labels = []
-    all_predicted_labels = []
+    # Drawing and encoding run on a background pool; render=False only computes metrics
+    visualizations = VisualizationWriter(output_dir, num_threads=render_threads, image_format=image_format,
+                                         quality=quality) if render else None
+    # Predictions joined to their lng/lat footprints for maps (building_predictions.parquet)
+    geo_predictions = GeoPredictionWriter(geo_output, resume=False) if geo_output else None
+
+    # Running confusion matrix for performance metrics
+    metrics = ConfusionMatrixAccumulator()
     building_info = []
 
     processed_count = 0
-    for json_file in os.listdir(json_dir):
+    for json_file in (json_files if json_files is not None else os.listdir(json_dir)):
         if processed_count >= num_images:
             break
             
@@ -105,88 +51,69 @@ def visualize_predictions(model, device, json_dir, image_dir, output_dir, num_im
             continue
 
         image_path = os.path.join(image_dir, image_name)
-        image = cv2.imread(image_path)
-        if image is None:
-            continue
-
-        # Create a copy for visualization
-        vis_image = image.copy()
-
-        for building in data.get("features", {}).get("xy", []):
-            wkt_string = building.get("wkt", "")
-            if not wkt_string.startswith("POLYGON (("):
+        image, scores, cache_key = None, None, None
+        if prediction_cache is not None and os.path.exists(image_path):
+            # Scenes scored before with the same image, labels and checkpoint skip decoding and the model
+            cache_key = prediction_cache.scene_key(image_path, json_path)
+            cached = prediction_cache.load_buildings(cache_key, label_buildings(data))
+            if cached is not None:
+                buildings, scores = cached
+
+        if scores is None:
+            if crop_store is not None:
+                # Pre-extracted shard crops; the scene is decoded only for missing buildings or for drawing
+                buildings, image = crop_store.scene_buildings(image_name, data, image_path, load_image=render)
+                if buildings is None:
+                    continue
+            else:
+                image = cv2.imread(image_path)
+                if image is None:
+                    continue
+                buildings = crop_buildings(image, data)
+
+            # Classify every building of the scene in batches
+            _, scores = predict_damage_batch(model, device, [b['crop'] for b in buildings], batch_size=batch_size)
+            # Without the image (scored from the crop store) there is no content hash to key the entry by
+            if cache_key is not None:
+                prediction_cache.save(cache_key, [b['building_id'] for b in buildings], scores)
+        elif render:
+            image = cv2.imread(image_path)
+            if image is None:
                 continue
+        building_ids = [b['building_id'] for b in buildings]
+        predicted_classes = scores.argmax(axis=1)
 
-            coords = wkt_string[10:-2].split(", ")
-            polygon = np.array([list(map(float, coord.split())) for coord in coords])
+        # Store metrics
+        metrics.update([damage_classes[b['true_label']] for b in buildings], predicted_classes)
 
-            # Crop the building
-            x_min, y_min = polygon.min(axis=0).astype(int)
-            x_max, y_max = polygon.max(axis=0).astype(int)
-            building_crop = image[y_min:y_max, x_min:x_max]
-
-            if building_crop.shape[0] == 0 or building_crop.shape[1] == 0:
-                continue
-
-            # Get true label
-            true_label = building.get("properties", {}).get("subtype", "unknown")
-            if true_label not in damage_classes:
-                continue
-            true_class = damage_classes[true_label]
-
-            # Make prediction
-            predicted_class = predict_damage(model, device, building_crop)
-            predicted_label = list(damage_classes.keys())[predicted_class]
-
-            # Store metrics
-            all_true_labels.append(true_class)
-            all_predicted_labels.append(predicted_class)
+        predicted_labels = [list(damage_classes.keys())[c] for c in predicted_classes]
+        for building, predicted_label in zip(buildings, predicted_labels):
             building_info.append({
                 'image_name': image_name,
-                'building_id': building.get("properties", {}).get("uid", "unknown"),
-                'true_label': true_label,
+                'building_id': building['building_id'],
+                'true_label': building['true_label'],
                 'predicted_label': predicted_label
             })
 
-            # Get color for predicted label
-            pred_color = damage_colors[predicted_label]
+        if geo_predictions is not None:
+            footprints = lng_lat_footprints(data)
+            geo_predictions.write_scene(image_name, building_ids, [b['true_label'] for b in buildings],
+                                        predicted_labels, [footprints.get(uid) for uid in building_ids], scores)
+
+        if visualizations is not None:
+            # The crops are no longer needed, so the writer can draw on the scene itself
+            visualizations.submit(image, image_name, [b['polygon'] for b in buildings], predicted_labels)
+            print(f"Queued prediction visualization: {visualizations.output_path(image_name)}")
 
-            # Draw polygon with predicted label color
-            pts = polygon.reshape((-1, 1, 2)).astype(np.int32)
-            cv2.polylines(vis_image, [pts], isClosed=True, color=pred_color, thickness=2)
-            
-            # Add predicted label
-            centroid = np.mean(polygon, axis=0).astype(int)
-            cv2.putText(vis_image, predicted_label, tuple(centroid), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, pred_color, 1, cv2.LINE_AA)
-
-        # Save the visualization
-        output_path = os.path.join(output_dir, f"prediction_{image_name}")
-        cv2.imwrite(output_path, vis_image)
-        print(f"Saved prediction visualization: {output_path}")
-        
         processed_count += 1
 
-    # Create performance metrics
-    class_report = classification_report(all_true_labels, all_predicted_labels, 
-                                      target_names=list(damage_classes.keys()),
-                                      output_dict=True)
-    
-    # Convert to DataFrame and save
-    metrics_df = pd.DataFrame(class_report).transpose()
-    metrics_df.to_csv(os.path.join(output_dir, 'performance_metrics.csv'))
-    
-    # Create confusion matrix
-    cm = confusion_matrix(all_true_labels, all_predicted_labels)
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
-                xticklabels=damage_classes.keys(),
-                yticklabels=damage_classes.keys())
-    plt.title('Confusion Matrix')
-    plt.ylabel('True Label')
-    plt.xlabel('Predicted Label')
-    plt.savefig(os.path.join(output_dir, 'confusion_matrix.png'))
-    plt.close()
+    if visualizations is not None:
+        visualizations.close()
+    if geo_predictions is not None:
+        geo_predictions.close()
+
+    # Create performance metrics and confusion matrix
+    metrics_df = save_accumulated_metrics(metrics, output_dir)
 
     # Save building-level predictions
     predictions_df = pd.DataFrame(building_info)